@@ -0,0 +1,255 @@
+"""
+Incremental browser history sampler (Chrome-family and Firefox, local only).
+
+Reads the local History / places.sqlite databases and returns only visits
+newer than a persisted watermark, so every sample costs O(new visits)
+instead of rescanning the whole history. The watermark is the last visit id
+plus the newest visit time per profile: visit ids are plain rowids, so after
+"clear history" new visits reuse ids at or below the old maximum; those are
+found by their time (visit time index), and the id watermark moves back to
+the current maximum.
+
+Consistency: the database is opened read-only and queried inside a single
+read transaction (a consistent SQLite snapshot). If the browser holds an
+exclusive lock (Chrome on Windows), the file and its -wal/-journal are
+copied to a temp dir and the copy is queried instead. Unchanged files
+(same size and mtime) are skipped without opening them.
+
+Fixture databases with the same schema: Collector/history_fixtures.py.
+
+Output rows match BROWSER_HISTORY_CSV:
+    [timestamp, browser, url, title, visit_count, last_visit_time]
+where both times are int64 epoch milliseconds.
+"""
+
+import glob
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+
+from .timestamps import now_epoch_ms
+
+BATCH_SIZE = 5000            # visits fetched per query
+INITIAL_BACKFILL_DAYS = 1    # first sample of a new profile: only recent visits
+
+# Chrome: microseconds since 1601-01-01, Firefox: microseconds since 1970-01-01
+_CHROME_EPOCH_OFFSET_MS = 11_644_473_600_000
+
+_QUERIES = {
+    "chrome": """
+        SELECT v.id, u.url, u.title, u.visit_count,
+               v.visit_time / 1000 - {offset} AS visit_ms
+        FROM visits v JOIN urls u ON u.id = v.url
+        WHERE v.id > ? AND v.visit_time >= (? + {offset}) * 1000
+        ORDER BY v.id LIMIT ?
+    """.format(offset=_CHROME_EPOCH_OFFSET_MS),
+    "firefox": """
+        SELECT v.id, p.url, p.title, p.visit_count,
+               v.visit_date / 1000 AS visit_ms
+        FROM moz_historyvisits v JOIN moz_places p ON p.id = v.place_id
+        WHERE v.id > ? AND v.visit_date >= ? * 1000
+        ORDER BY v.id LIMIT ?
+    """,
+}
+# Wizyty z ponownie użytym id (<= watermark id), ale nowsze niż watermark czasu (jednostki bazy)
+_REUSED_QUERIES = {
+    "chrome": """
+        SELECT v.id, u.url, u.title, u.visit_count,
+               v.visit_time / 1000 - {offset} AS visit_ms
+        FROM visits v JOIN urls u ON u.id = v.url
+        WHERE v.id <= ? AND v.visit_time > ?
+        ORDER BY v.id
+    """.format(offset=_CHROME_EPOCH_OFFSET_MS),
+    "firefox": """
+        SELECT v.id, p.url, p.title, p.visit_count,
+               v.visit_date / 1000 AS visit_ms
+        FROM moz_historyvisits v JOIN moz_places p ON p.id = v.place_id
+        WHERE v.id <= ? AND v.visit_date > ?
+        ORDER BY v.id
+    """,
+}
+_MAX_QUERIES = {
+    "chrome": "SELECT MAX(id), MAX(visit_time) FROM visits",
+    "firefox": "SELECT MAX(id), MAX(visit_date) FROM moz_historyvisits",
+}
+
+
+class HistorySource:
+    """One browser profile database."""
+
+    def __init__(self, browser: str, path, kind: str = "chrome"):
+        if kind not in _QUERIES:
+            raise ValueError(f"Unknown history kind: {kind}")
+        self.browser = browser
+        self.path = Path(path)
+        self.kind = kind
+
+    @property
+    def key(self) -> str:
+        return f"{self.browser}:{self.path}"
+
+    def __repr__(self):
+        return f"HistorySource({self.browser!r}, {str(self.path)!r}, {self.kind!r})"
+
+
+def default_sources():
+    """Finds History databases of installed browsers for the current user."""
+    home = Path.home()
+    if sys.platform.startswith("win"):
+        local = Path(os.environ.get("LOCALAPPDATA", home / "AppData/Local"))
+        roaming = Path(os.environ.get("APPDATA", home / "AppData/Roaming"))
+        chrome_like = {
+            "chrome": local / "Google/Chrome/User Data/*/History",
+            "edge": local / "Microsoft/Edge/User Data/*/History",
+            "opera": roaming / "Opera Software/Opera Stable/History",
+        }
+        firefox = roaming / "Mozilla/Firefox/Profiles/*/places.sqlite"
+    elif sys.platform == "darwin":
+        support = home / "Library/Application Support"
+        chrome_like = {
+            "chrome": support / "Google/Chrome/*/History",
+            "edge": support / "Microsoft Edge/*/History",
+            "opera": support / "com.operasoftware.Opera/History",
+        }
+        firefox = support / "Firefox/Profiles/*/places.sqlite"
+    else:
+        config = home / ".config"
+        chrome_like = {
+            "chrome": config / "google-chrome/*/History",
+            "chromium": config / "chromium/*/History",
+            "opera": config / "opera/History",
+        }
+        firefox = home / ".mozilla/firefox/*/places.sqlite"
+
+    sources = []
+    for browser, pattern in chrome_like.items():
+        for path in sorted(glob.glob(str(pattern))):
+            sources.append(HistorySource(browser, path, "chrome"))
+    for path in sorted(glob.glob(str(firefox))):
+        sources.append(HistorySource("firefox", path, "firefox"))
+    return sources
+
+
+def _copy_locked_db(path: Path, tmp_dir: str) -> Path:
+    """Copies a locked database (with its WAL/journal) for a private snapshot."""
+    target = Path(tmp_dir) / path.name
+    shutil.copy2(path, target)
+    for suffix in ("-wal", "-journal"):
+        side = Path(str(path) + suffix)
+        if side.exists():
+            shutil.copy2(side, Path(str(target) + suffix))
+    return target
+
+
+class BrowserHistorySampler:
+    """Fetches new visits past a persisted per-profile watermark."""
+
+    def __init__(self, sources=None, state_path="data/browser_history_state.json"):
+        self.sources = default_sources() if sources is None else list(sources)
+        self.state_path = Path(state_path)
+        self.state = self._load_state()
+
+    def _load_state(self) -> dict:
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self):
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp, self.state_path)  # atomowa podmiana pliku stanu
+
+    def _fetch(self, db_path: Path, source: HistorySource, last_id: int, last_time, since_ms: int):
+        """Returns (new visits, max visit id, max visit time in the snapshot)."""
+        uri = f"{db_path.resolve().as_uri()}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, timeout=1)
+        try:
+            conn.execute("BEGIN")  # jedna transakcja = spójny snapshot
+            max_id, max_time = conn.execute(_MAX_QUERIES[source.kind]).fetchone()
+            rows = []
+            if last_time is not None and last_id:
+                rows.extend(conn.execute(_REUSED_QUERIES[source.kind], (last_id, last_time)).fetchall())
+            while True:
+                batch = conn.execute(_QUERIES[source.kind], (last_id, since_ms, BATCH_SIZE)).fetchall()
+                rows.extend(batch)
+                if len(batch) < BATCH_SIZE:
+                    break
+                last_id = batch[-1][0]
+            conn.execute("COMMIT")
+            return rows, max_id or 0, max_time
+        finally:
+            conn.close()
+
+    def sample_source(self, source: HistorySource):
+        """Returns new CSV rows for one profile and advances its watermark."""
+        if not source.path.exists():
+            return []
+        st = source.path.stat()
+        entry = self.state.get(source.key, {})
+        fingerprint = [st.st_size, st.st_mtime_ns]
+        wal = Path(str(source.path) + "-wal")
+        if wal.exists():
+            wst = wal.stat()
+            fingerprint += [wst.st_size, wst.st_mtime_ns]
+        if entry.get("fingerprint") == fingerprint:
+            return []
+
+        last_id = entry.get("last_visit_id", 0)
+        last_time = entry.get("last_visit_time")   # surowy czas wizyty z bazy (µs)
+        since_ms = 0 if entry else now_epoch_ms() - INITIAL_BACKFILL_DAYS * 86_400_000
+
+        try:
+            visits, max_id, max_time = self._fetch(source.path, source, last_id, last_time, since_ms)
+        except sqlite3.OperationalError:
+            # Plik zablokowany przez przeglądarkę -> czytamy kopię
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                visits, max_id, max_time = self._fetch(
+                    _copy_locked_db(source.path, tmp_dir), source, last_id, last_time, since_ms
+                )
+
+        sampled_at = now_epoch_ms()
+        rows = [
+            [sampled_at, source.browser, url, title or "", visit_count, visit_ms]
+            for _, url, title, visit_count, visit_ms in visits
+        ]
+        # Wszystko do max_id zostało już rozpatrzone (także pominięte stare wizyty);
+        # po wyczyszczeniu historii max_id spada i watermark id razem z nim
+        entry["last_visit_id"] = max_id
+        if max_time is not None:
+            entry["last_visit_time"] = max(max_time, last_time or max_time)
+        entry["fingerprint"] = fingerprint
+        self.state[source.key] = entry
+        return rows
+
+    def sample(self, sink=None):
+        """
+        Samples all sources. Rows are passed to `sink(rows)` (bulk), which
+        must have them on disk when it returns: only then is the watermark
+        persisted. If the sink raises, the watermark stays where it was.
+        Returns the list of new rows.
+        """
+        previous = json.loads(json.dumps(self.state))
+        all_rows = []
+        for source in self.sources:
+            try:
+                rows = self.sample_source(source)
+            except (sqlite3.Error, OSError) as e:
+                print(f"[HISTORY] {source.browser}: {e}")
+                continue
+            all_rows.extend(rows)
+        if all_rows and sink is not None:
+            try:
+                sink(all_rows)
+            except Exception:
+                self.state = previous  # watermark nie przesuwa się bez zapisu
+                raise
+        self._save_state()
+        return all_rows
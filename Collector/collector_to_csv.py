@@ -5,25 +5,37 @@ Logs:
  - Clipboard contents (when changed) + active window at copy time
  - Copy / Paste events metadata (Ctrl/Cmd+C and Ctrl/Cmd+V): timestamp + active window + clipboard snapshot
  - Browser history sampling (Chrome and Firefox local history DB)
-Data stored in separate CSV files
+Data stored in separate CSV files (timestamps as int64 epoch milliseconds, UTC)
 
 IMPORTANT: This script does NOT record typed text (no keylogging).
 Run only on your own machine or with explicit consent.
 """
 
-import threading
-import time
+import argparse
+import asyncio
+import atexit
 import os
-import sys
 from datetime import datetime
 import csv
-import keyboard
-import win32gui
-import win32process
-import psutil
 
-import pyperclip
-import pygetwindow as gw
+# Windows-only sources. Optional so that the logging functions (and the
+# replay harness) can be imported on any OS without a GUI.
+try:
+    import keyboard
+    import win32api
+    import win32gui
+    import win32process
+    import psutil
+
+    import pyperclip
+    import pygetwindow as gw
+except ImportError:
+    keyboard = win32api = win32gui = win32process = psutil = pyperclip = gw = None
+
+from .csv_writer import CsvStreamWriter
+from .timestamps import now_epoch_ms
+from .browser_history import BrowserHistorySampler
+from .runtime import CollectorRuntime, FakeSource
 
 
 # ---------- Configuration ----------
@@ -33,7 +45,9 @@ WINDOWS_CSV = DATA_DIR / "windows.csv"
 CLIPBOARD_CSV = DATA_DIR / "clipboard.csv"
 EVENTS_CSV = DATA_DIR / "events.csv"
 BROWSER_HISTORY_CSV = DATA_DIR / "browser_history.csv"
+BROWSER_HISTORY_STATE = DATA_DIR / "browser_history_state.json"
 
+# Used when OS change notifications are unavailable (one coalesced tick at the shorter one)
 ACTIVE_WINDOW_POLL_INTERVAL = 1.0   # seconds
 CLIPBOARD_POLL_INTERVAL = 0.5       # seconds
 BROWSER_HISTORY_POLL_INTERVAL = 60  # seconds (sample every minute)
@@ -41,7 +55,18 @@ BROWSER_HISTORY_POLL_INTERVAL = 60  # seconds (sample every minute)
 
 # ---------- Helper utilities ----------
 
+def configure_data_dir(data_dir):
+    """Points all CSV outputs (and the history watermark) at another folder (e.g. for replays and tests)."""
+    global DATA_DIR, WINDOWS_CSV, CLIPBOARD_CSV, EVENTS_CSV, BROWSER_HISTORY_CSV, BROWSER_HISTORY_STATE
+    DATA_DIR = Path(data_dir)
+    WINDOWS_CSV = DATA_DIR / "windows.csv"
+    CLIPBOARD_CSV = DATA_DIR / "clipboard.csv"
+    EVENTS_CSV = DATA_DIR / "events.csv"
+    BROWSER_HISTORY_CSV = DATA_DIR / "browser_history.csv"
+    BROWSER_HISTORY_STATE = DATA_DIR / "browser_history_state.json"
+
 def now_iso():
+    """Human-readable UTC time, only for console output (CSV gets epoch ms)."""
     return datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
 
 def ensure_csv_files():
@@ -73,12 +98,13 @@ def ensure_csv_files():
             writer = csv.writer(f)
             writer.writerow(['timestamp', 'browser', 'url', 'title', 'visit_count', 'last_visit_time'])
 
+    # Long-lived handles (also repairs rows torn by a previous crash)
+    for path in (WINDOWS_CSV, CLIPBOARD_CSV, EVENTS_CSV, BROWSER_HISTORY_CSV):
+        csv_writer.register(path)
+
 def append_to_csv(filepath, row):
-    """Thread-safe append to CSV file"""
-    with csv_lock:
-        with open(filepath, 'a', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(row)
+    """Thread-safe append to CSV file (queued, written by the writer thread)"""
+    csv_writer.append(filepath, row)
 
 def get_active_window_info():
     """Pobiera nazwę procesu aktywnego okna"""
@@ -102,113 +128,88 @@ def get_active_window_info():
         print(f"Błąd: {e}")
         return None, None, None
 
-# ---------- CSV helper with lock ----------
-csv_lock = threading.Lock()
+# ---------- CSV writer (one buffered handle + queue per file) ----------
+csv_writer = CsvStreamWriter()
+# Wiersze z kolejki trafiają na dysk także przy zamykaniu procesu (np. APP.PY,
+# gdzie kolektor działa w wątku daemon i main() nie dochodzi do close())
+atexit.register(csv_writer.close)
+_runtime = None
 
 def log_window_snapshot(title, pid, process):
-    timestamp = now_iso()
+    timestamp = now_epoch_ms()
     append_to_csv(WINDOWS_CSV, [timestamp, title, process, pid])
 
 def log_clipboard(content, title, pid, process):
-    timestamp = now_iso()
+    timestamp = now_epoch_ms()
     # Escape newlines and quotes in content for CSV
     content_escaped = content.replace('\n', '\\n').replace('\r', '\\r')
     append_to_csv(CLIPBOARD_CSV, [timestamp, content_escaped, title, process, pid])
     return timestamp  # Return timestamp as ID
 
 def log_event(event_type, title, pid, process, clipboard_timestamp=None):
-    timestamp = now_iso()
+    timestamp = now_epoch_ms()
     append_to_csv(EVENTS_CSV, [timestamp, event_type, title, process, pid, clipboard_timestamp or ''])
     return timestamp
 
 
-# ---------- Active window monitor ----------
-def active_window_monitor(stop_event):
-    last_title = None
-    while not stop_event.is_set():
-        title, pid, process = get_active_window_info()
-        if title != last_title:
-            print(f"[WINDOW] {now_iso()} - {title} ({process} pid={pid})")
-            log_window_snapshot(title, pid, process)
-            last_title = title
-        time.sleep(ACTIVE_WINDOW_POLL_INTERVAL)
-
-# ---------- Clipboard monitor ----------
-# Global to track clipboard and prevent double-logging from keyboard events
-last_clipboard_content = None
-clipboard_lock = threading.Lock()
-
-def clipboard_monitor(stop_event):
-    global last_clipboard_content
-    while not stop_event.is_set():
+# ---------- Windows sources (window, clipboard, idle time, hotkeys) ----------
+class WindowsSource:
+    """Real desktop source for CollectorRuntime (see Collector/runtime.py)."""
+
+    def active_window(self):
+        return get_active_window_info()
+
+    def clipboard(self):
         try:
-            clip = pyperclip.paste()
+            return pyperclip.paste()
         except Exception:
-            clip = None
-        if clip and clip != last_clipboard_content:
-            with clipboard_lock:
-                if clip != last_clipboard_content:
-                    title, pid, process = get_active_window_info()
-                    clip_timestamp = log_clipboard(clip, title, pid, process)
-                    print(f"[CLIP] {now_iso()} - clipboard changed (len={len(clip)}) in window '{title}'")
-                    last_clipboard_content = clip
-        time.sleep(CLIPBOARD_POLL_INTERVAL)
-
-# ---------- Keyboard listener for copy/paste events ----------
-def keyboard_listener_thread(stop_event):
-    
-    def on_copy():
-        global last_clipboard_content
-        title, pid, process = get_active_window_info()
-        print("[EVENT] Copy detected!")
-        
-        # Get clipboard content 
-        try:
-            clip = pyperclip.paste()
-            clip_timestamp = None
-            if clip:
-                with clipboard_lock:
-                    if clip != last_clipboard_content:
-                        clip_timestamp = log_clipboard(clip, title, pid, process)
-                        last_clipboard_content = clip
-                    else:
-                        clip_timestamp = now_iso()
-            
-            event_timestamp = log_event('copy', title, pid, process, clipboard_timestamp=clip_timestamp)
-            print(f"[EVENT] Copy event logged at {event_timestamp}")
-        except Exception as e:
-            print(f"[ERROR] Copy event error: {e}")
-
-    def on_paste():
-        title, pid, process = get_active_window_info()
-        print("[EVENT] Paste detected!")
-        
+            return None
+
+    def idle_seconds(self):
+        # czas od ostatniego wejścia z klawiatury/myszy
         try:
-            clip = pyperclip.paste()
-            clip_timestamp = now_iso() if clip else None
-            event_timestamp = log_event('paste', title, pid, process, clipboard_timestamp=clip_timestamp)
-            print(f"[EVENT] Paste event logged at {event_timestamp}")
-        except Exception as e:
-            print(f"[ERROR] Paste event error: {e}")
-
-    # Register hotkeys
-    keyboard.add_hotkey("ctrl+c", on_copy, suppress=False)
-    keyboard.add_hotkey("ctrl+v", on_paste, suppress=False)
-    
-    # Keep thread running until stop event
-    while not stop_event.is_set():
-        time.sleep(0.1)
-    
-    # Clean up
-    keyboard.unhook_all()
+            return (win32api.GetTickCount() - win32api.GetLastInputInfo()) / 1000.0
+        except Exception:
+            return 0.0
+
+    def add_hotkeys(self, callback):
+        # Wywoływane w wątku hooka klawiatury; runtime przenosi je do pętli
+        keyboard.add_hotkey("ctrl+c", callback, args=("copy",), suppress=False)
+        keyboard.add_hotkey("ctrl+v", callback, args=("paste",), suppress=False)
+
+    def remove_hotkeys(self):
+        keyboard.unhook_all()
+
+    def watch_changes(self, callback):
+        # Powiadomienia systemowe (aktywne okno, tytuł, schowek) zamiast częstego odpytywania
+        from .win_events import WindowsWatcher
+        self._watcher = WindowsWatcher(callback)
+        return self._watcher.start_and_wait()
+
+    def unwatch_changes(self):
+        watcher = getattr(self, "_watcher", None)
+        if watcher is not None:
+            watcher.stop()
+            watcher.join(timeout=2)
+            self._watcher = None
 
 # ---------- Browser history reader (Chrome, Firefox local) ----------
 
+def commit_history_rows(rows):
+    # Wiersze muszą być na dysku, zanim sampler zapisze nowy watermark
+    csv_writer.extend(BROWSER_HISTORY_CSV, rows)
+    csv_writer.flush()
 
+def sample_browser_history(sampler):
+    rows = sampler.sample(sink=commit_history_rows)
+    if rows:
+        print(f"[HISTORY] {now_iso()} - {len(rows)} new visits")
+    return len(rows)
 
 
 # ---------- Main controller ----------
-def main():
+def main(source=None, duration=None):
+    """Runs the collector on one event loop (`source` defaults to WindowsSource)."""
     print("ProcessBot Local Demo Collector (CSV version)")
     print("This script collects active windows, clipboard contents, copy/paste events, and local browser history.")
     print(f"Data will be stored in separate CSV files:")
@@ -216,32 +217,53 @@ def main():
     print(f"  - {CLIPBOARD_CSV}")
     print(f"  - {EVENTS_CSV}")
     print(f"  - {BROWSER_HISTORY_CSV}")
-    
-    ensure_csv_files()
-    stop_event = threading.Event()
-    threads = []
 
-    t_window = threading.Thread(target=active_window_monitor, args=(stop_event,), daemon=True)
-    threads.append(t_window)
-    t_clip = threading.Thread(target=clipboard_monitor, args=(stop_event,), daemon=True)
-    threads.append(t_clip)
-    t_kb = threading.Thread(target=keyboard_listener_thread, args=(stop_event,), daemon=True)
-    threads.append(t_kb)
+    if source is None:
+        if win32gui is None:
+            print("Window/clipboard/keyboard monitors need Windows (pywin32, keyboard, pyperclip); use --fake elsewhere.")
+            return
+        source = WindowsSource()
 
-    print("\nStarting monitors... Press Ctrl+C here to stop.")
-    for t in threads:
-        t.start()
+    ensure_csv_files()
+    sampler = BrowserHistorySampler(state_path=BROWSER_HISTORY_STATE)
+    print(f"[HISTORY] Sources: {', '.join(s.browser for s in sampler.sources) or 'none'}")
+    runtime = CollectorRuntime(
+        source,
+        log_window=log_window_snapshot,
+        log_clipboard=log_clipboard,
+        log_event=log_event,
+        poll_interval=min(ACTIVE_WINDOW_POLL_INTERVAL, CLIPBOARD_POLL_INTERVAL),
+        history_interval=BROWSER_HISTORY_POLL_INTERVAL,
+        sample_history=lambda: sample_browser_history(sampler),
+    )
 
+    print("\nStarting monitors... Press Ctrl+C here to stop.")
+    global _runtime
+    _runtime = runtime
+    csv_writer.start()
     try:
-        while True:
-            time.sleep(1)
+        asyncio.run(runtime.run(duration=duration))
     except KeyboardInterrupt:
         print("\nStopping monitors...")
-        stop_event.set()
-        for t in threads:
-            t.join(timeout=2)
-        print("Stopped. Data saved in CSV files.")
-        sys.exit(0)
+    finally:
+        _runtime = None
+        csv_writer.close()
+    print(f"Stopped. Data saved in CSV files. {runtime.stats}")
+    return runtime.stats
+
+
+def stop():
+    """Thread-safe request to end a running main() (it flushes and closes the CSVs)."""
+    if _runtime is not None:
+        _runtime.stop()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="ProcessBot local collector")
+    parser.add_argument("--fake", action="store_true", help="scripted demo source (any OS)")
+    parser.add_argument("--no-events", action="store_true", help="fake source without change notifications (polling only)")
+    parser.add_argument("--duration", type=float, default=None, help="stop after N seconds")
+    parser.add_argument("--data-dir", default=None, help="output folder (default ./data)")
+    args = parser.parse_args()
+    if args.data_dir:
+        configure_data_dir(args.data_dir)
+    main(source=FakeSource.demo(events=not args.no_events) if args.fake else None, duration=args.duration)
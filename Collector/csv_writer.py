@@ -0,0 +1,187 @@
+"""
+Buffered CSV writer used by the collector.
+
+Every CSV stream gets one long-lived, buffered file handle and its own queue.
+Producers (window monitor, clipboard monitor, keyboard hooks) only enqueue
+rows; a single writer thread drains all queues and commits them in groups
+(one flush + fsync per batch instead of one open/close per row).
+
+On open, a stream whose last line was cut by a crash (no trailing newline)
+is truncated back to the last complete row, so readers never see torn rows.
+"""
+
+import csv
+import os
+import queue
+import threading
+from pathlib import Path
+
+FLUSH_INTERVAL = 0.5   # seconds between group commits
+MAX_BATCH_ROWS = 1024  # rows drained from one stream per commit
+
+
+def repair_torn_tail(filepath):
+    """Truncates a partially written last row. Returns number of bytes removed."""
+    if not os.path.exists(filepath):
+        return 0
+    with open(filepath, 'rb+') as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size == 0:
+            return 0
+        f.seek(size - 1)
+        if f.read(1) == b'\n':
+            return 0
+
+        # Szukamy ostatniego końca linii od tyłu, blokami
+        block = 4096
+        pos = size
+        cut = 0
+        while pos > 0:
+            start = max(0, pos - block)
+            f.seek(start)
+            chunk = f.read(pos - start)
+            idx = chunk.rfind(b'\n')
+            if idx != -1:
+                cut = start + idx + 1
+                break
+            pos = start
+        f.truncate(cut)
+        return size - cut
+
+
+class _Stream:
+    def __init__(self, filepath, header=None):
+        self.path = Path(filepath)
+        self.header = header
+        self.queue = queue.SimpleQueue()
+        self.handle = None
+        self.writer = None
+
+    def open(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        removed = repair_torn_tail(self.path)
+        if removed:
+            print(f"[WRITER] Removed torn row ({removed} bytes) from {self.path}")
+        is_new = not self.path.exists() or self.path.stat().st_size == 0
+        self.handle = open(self.path, 'a', newline='', encoding='utf-8', buffering=64 * 1024)
+        self.writer = csv.writer(self.handle)
+        if is_new and self.header:
+            self.writer.writerow(self.header)
+
+    def drain(self, max_rows=MAX_BATCH_ROWS):
+        rows = []
+        try:
+            while len(rows) < max_rows:
+                rows.append(self.queue.get_nowait())
+        except queue.Empty:
+            pass
+        if rows:
+            self.writer.writerows(rows)
+        return len(rows)
+
+    def commit(self, fsync=True):
+        self.handle.flush()
+        if fsync:
+            os.fsync(self.handle.fileno())
+
+    def close(self):
+        if self.handle is not None:
+            self.handle.close()
+            self.handle = None
+            self.writer = None
+
+
+class CsvStreamWriter:
+    """Group-commit writer for several CSV files (one queue per file)."""
+
+    def __init__(self, flush_interval=FLUSH_INTERVAL, fsync=True):
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self._streams = {}
+        self._streams_lock = threading.Lock()  # tylko przy rejestracji strumienia
+        self._commit_lock = threading.Lock()   # jeden drenujący naraz
+        self._pending = threading.Event()      # są wiersze w kolejkach
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def register(self, filepath, header=None):
+        """Registers (and opens) a stream. Safe to call more than once."""
+        key = str(filepath)
+        with self._streams_lock:
+            stream = self._streams.get(key)
+            if stream is None:
+                stream = _Stream(filepath, header)
+                stream.open()
+                self._streams[key] = stream
+        return stream
+
+    def append(self, filepath, row):
+        """Enqueues a row; never touches the disk on the caller's thread."""
+        stream = self._streams.get(str(filepath)) or self.register(filepath)
+        stream.queue.put(list(row))
+        self._pending.set()
+        if self._thread is None:
+            self.start()
+
+    def extend(self, filepath, rows):
+        """Enqueues many rows at once (bulk producers, e.g. history sampler)."""
+        stream = self._streams.get(str(filepath)) or self.register(filepath)
+        for row in rows:
+            stream.queue.put(list(row))
+        self._pending.set()
+        if self._thread is None:
+            self.start()
+        self._wake.set()
+
+    def start(self):
+        with self._streams_lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="csv-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._pending.wait()                  # bez danych wątek śpi bez limitu
+            self._wake.wait(self.flush_interval)  # okno grupowego zatwierdzenia
+            self._pending.clear()
+            self._wake.clear()
+            try:
+                self._commit_all()
+            except Exception as e:
+                print(f"[WRITER] Commit error: {e}")
+
+    def _commit_all(self):
+        with self._commit_lock:
+            for stream in list(self._streams.values()):
+                if stream.handle is None:
+                    continue
+                written = 0
+                while True:
+                    n = stream.drain()
+                    written += n
+                    if n < MAX_BATCH_ROWS:
+                        break
+                if written:
+                    stream.commit(self.fsync)
+
+    def flush(self):
+        """Writes everything queued so far and syncs it to disk."""
+        self._commit_all()
+
+    def close(self, timeout=2):
+        """Stops the writer thread, flushes remaining rows and closes files."""
+        self._stop.set()
+        self._pending.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        self._commit_all()
+        with self._commit_lock:
+            for stream in self._streams.values():
+                stream.close()
+            self._streams.clear()
@@ -0,0 +1,141 @@
+"""
+Fixture history databases for BrowserHistorySampler (no browser needed).
+
+Builds minimal Chrome (History: urls + visits) and Firefox (places.sqlite:
+moz_places + moz_historyvisits) files with the columns the sampler reads,
+and can append visits later to simulate a browser that keeps running.
+
+    python -m Collector.history_fixtures    # builds fixtures in a temp dir and checks the sampler
+"""
+
+import sqlite3
+import tempfile
+from pathlib import Path
+
+from .browser_history import _CHROME_EPOCH_OFFSET_MS, BrowserHistorySampler, HistorySource
+from .timestamps import now_epoch_ms
+
+_SCHEMAS = {
+    "chrome": """
+        CREATE TABLE IF NOT EXISTS urls (id INTEGER PRIMARY KEY, url TEXT, title TEXT,
+                                         visit_count INTEGER, last_visit_time INTEGER);
+        CREATE TABLE IF NOT EXISTS visits (id INTEGER PRIMARY KEY, url INTEGER, visit_time INTEGER);
+    """,
+    "firefox": """
+        CREATE TABLE IF NOT EXISTS moz_places (id INTEGER PRIMARY KEY, url TEXT, title TEXT,
+                                               visit_count INTEGER, last_visit_date INTEGER);
+        CREATE TABLE IF NOT EXISTS moz_historyvisits (id INTEGER PRIMARY KEY, place_id INTEGER,
+                                                      visit_date INTEGER);
+    """,
+}
+
+
+def add_visits(path, visits, kind: str = "chrome"):
+    """
+    Appends visits to a fixture database (created if missing).
+
+    Args:
+        path: History / places.sqlite file
+        visits: [(url, title, visit_ms)] with visit_ms as epoch milliseconds
+        kind: 'chrome' or 'firefox'
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path)
+    try:
+        conn.executescript(_SCHEMAS[kind])
+        places, visits_table, place_col, time_col, last_col = (
+            ("urls", "visits", "url", "visit_time", "last_visit_time") if kind == "chrome"
+            else ("moz_places", "moz_historyvisits", "place_id", "visit_date", "last_visit_date")
+        )
+        for url, title, visit_ms in visits:
+            # Chrome: mikrosekundy od 1601-01-01, Firefox: od 1970-01-01
+            stamp = (visit_ms + (_CHROME_EPOCH_OFFSET_MS if kind == "chrome" else 0)) * 1000
+            row = conn.execute(f"SELECT id FROM {places} WHERE url = ?", (url,)).fetchone()
+            if row is None:
+                place_id = conn.execute(
+                    f"INSERT INTO {places} (url, title, visit_count, {last_col}) VALUES (?, ?, 1, ?)",
+                    (url, title, stamp),
+                ).lastrowid
+            else:
+                place_id = row[0]
+                conn.execute(
+                    f"UPDATE {places} SET visit_count = visit_count + 1, {last_col} = ? WHERE id = ?",
+                    (stamp, place_id),
+                )
+            conn.execute(f"INSERT INTO {visits_table} ({place_col}, {time_col}) VALUES (?, ?)", (place_id, stamp))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def clear_visits(path, kind: str = "chrome", keep: int = 0):
+    """Deletes all but the first `keep` visits, like the browser's "clear history"."""
+    table = "visits" if kind == "chrome" else "moz_historyvisits"
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute(f"DELETE FROM {table} WHERE id NOT IN (SELECT id FROM {table} ORDER BY id LIMIT ?)", (keep,))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def make_fixture_sources(folder, visits_per_browser: int = 3):
+    """Chrome and Firefox fixture profiles with recent visits; returns [HistorySource]."""
+    folder = Path(folder)
+    now = now_epoch_ms()
+    sources = []
+    for browser, kind, name in (("chrome", "chrome", "History"), ("firefox", "firefox", "places.sqlite")):
+        path = folder / browser / name
+        add_visits(path, [
+            (f"https://{browser}.example/{i}", f"{browser} page {i}", now - (visits_per_browser - i) * 60_000)
+            for i in range(visits_per_browser)
+        ], kind)
+        sources.append(HistorySource(browser, path, kind))
+    return sources
+
+
+def _check():
+    """Incremental sampling against fixtures: new visits only, watermark after the sink, reused ids."""
+    with tempfile.TemporaryDirectory() as tmp:
+        sources = make_fixture_sources(tmp)
+        state = Path(tmp) / "state.json"
+        written = []
+
+        sampler = BrowserHistorySampler(sources, state_path=state)
+        assert len(sampler.sample(sink=written.extend)) == 6
+        assert sampler.sample(sink=written.extend) == []            # bez zmian w plikach
+
+        add_visits(sources[0].path, [("https://chrome.example/new", "new", now_epoch_ms())])
+        rows = BrowserHistorySampler(sources, state_path=state).sample(sink=written.extend)
+        assert [r[2] for r in rows] == ["https://chrome.example/new"], rows
+
+        def failing_sink(rows):
+            raise OSError("disk full")
+
+        add_visits(sources[1].path, [("https://firefox.example/new", "new", now_epoch_ms())], "firefox")
+        try:
+            BrowserHistorySampler(sources, state_path=state).sample(sink=failing_sink)
+        except OSError:
+            pass
+        rows = BrowserHistorySampler(sources, state_path=state).sample(sink=written.extend)
+        assert [r[2] for r in rows] == ["https://firefox.example/new"], rows   # nic nie zginęło
+        assert len(written) == 8
+
+        # "wyczyść ostatnią godzinę": nowe wizyty dostają te same id co usunięte
+        clear_visits(sources[0].path, keep=2)
+        add_visits(sources[0].path, [(f"https://chrome.example/again{i}", "again", now_epoch_ms() + 1 + i) for i in range(2)])
+        rows = BrowserHistorySampler(sources, state_path=state).sample(sink=written.extend)
+        assert sorted(r[2] for r in rows) == ["https://chrome.example/again0", "https://chrome.example/again1"], rows
+
+        # "wyczyść wszystko": id zaczynają się od nowa
+        clear_visits(sources[1].path, "firefox")
+        add_visits(sources[1].path, [("https://firefox.example/fresh", "fresh", now_epoch_ms() + 1)], "firefox")
+        rows = BrowserHistorySampler(sources, state_path=state).sample(sink=written.extend)
+        assert [r[2] for r in rows] == ["https://firefox.example/fresh"], rows
+        assert BrowserHistorySampler(sources, state_path=state).sample(sink=written.extend) == []
+    print("history fixtures: OK")
+
+
+if __name__ == "__main__":
+    _check()
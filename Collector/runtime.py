@@ -0,0 +1,302 @@
+"""
+Single event-loop collector runtime (asyncio).
+
+One loop replaces the window / clipboard / keyboard / history threads:
+ - the active window and the clipboard are checked in the same tick (one wakeup),
+ - change notifications from the OS (foreground / title change, clipboard
+   update) and hotkey callbacks arrive on their hook threads and are
+   marshalled into the loop with call_soon_threadsafe; they wake the poller,
+   which reads and logs the change right away,
+ - with such notifications the poll is only a safety net, so its interval
+   backs off from MIN_POLL_INTERVAL by POLL_BACKOFF up to MAX_POLL_INTERVAL,
+   and IDLE_POLL_INTERVAL once the user has had no input for IDLE_AFTER
+   seconds; a source without notifications is polled every `poll_interval`
+   (the collector's old window / clipboard intervals), so nothing is missed,
+ - browser history sampling runs in the default executor on its own timer.
+
+Sources are pluggable: collector_to_csv.WindowsSource (pywin32, pyperclip,
+keyboard, Collector/win_events.py) or FakeSource below (scripted, any OS)
+for tests and demos.
+"""
+
+import asyncio
+import random
+import threading
+import time
+
+from .timestamps import now_epoch_ms
+
+# Interwały zapasowego odpytywania, gdy źródło zgłasza zmiany samo
+MIN_POLL_INTERVAL = 0.5     # sekundy, tuż po zmianie
+MAX_POLL_INTERVAL = 5.0     # bez zmian, użytkownik aktywny
+IDLE_POLL_INTERVAL = 30.0   # użytkownik bezczynny
+IDLE_AFTER = 60.0           # po ilu sekundach bez wejścia uznajemy bezczynność
+POLL_BACKOFF = 1.5
+
+
+class CollectorRuntime:
+    """
+    Polls `source` and hands observations to the log callbacks:
+    log_window(title, pid, process), log_clipboard(content, title, pid, process) -> ts,
+    log_event(kind, title, pid, process, clipboard_timestamp=None) -> ts.
+    """
+
+    def __init__(
+        self,
+        source,
+        log_window,
+        log_clipboard,
+        log_event,
+        poll_interval: float,
+        history_interval: float,
+        sample_history=None,
+        min_interval: float = MIN_POLL_INTERVAL,
+        max_interval: float = MAX_POLL_INTERVAL,
+        idle_interval: float = IDLE_POLL_INTERVAL,
+        idle_after: float = IDLE_AFTER,
+        echo=print,
+    ):
+        self.source = source
+        self.log_window = log_window
+        self.log_clipboard = log_clipboard
+        self.log_event = log_event
+        self.sample_history = sample_history
+        self.poll_interval = poll_interval
+        self.event_driven = False
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.idle_interval = idle_interval
+        self.idle_after = idle_after
+        self.history_interval = history_interval
+        self.echo = echo or (lambda *a: None)
+
+        self.last_title = None
+        self.last_clipboard = None
+        self.stats = {"ticks": 0, "notifications": 0, "windows": 0, "clipboard": 0,
+                      "copy": 0, "paste": 0, "history": 0}
+        self._loop = None
+        self._wake = None
+        self._stop = None
+
+    # ---------- Obserwacje (zawsze w wątku pętli) ----------
+
+    def _check(self) -> bool:
+        """One coalesced tick: window + clipboard. Returns True if anything changed."""
+        self.stats["ticks"] += 1
+        changed = False
+        title, pid, process = self.source.active_window()
+        if title != self.last_title:
+            self.echo(f"[WINDOW] {title} ({process} pid={pid})")
+            self.log_window(title, pid, process)
+            self.stats["windows"] += 1
+            self.last_title = title
+            changed = True
+
+        clip = self.source.clipboard()
+        if clip and clip != self.last_clipboard:
+            self.log_clipboard(clip, title, pid, process)
+            self.echo(f"[CLIP] clipboard changed (len={len(clip)}) in window '{title}'")
+            self.stats["clipboard"] += 1
+            self.last_clipboard = clip
+            changed = True
+        return changed
+
+    def _on_hotkey(self, kind: str, fired_ms: int):
+        self._wake.set()  # aktywność -> krótki interwał
+        try:
+            title, pid, process = self.source.active_window()
+            clip = self.source.clipboard()
+            clip_timestamp = None
+            if clip:
+                if kind == "copy" and clip != self.last_clipboard:
+                    clip_timestamp = self.log_clipboard(clip, title, pid, process)
+                    self.last_clipboard = clip
+                else:
+                    clip_timestamp = fired_ms
+            event_timestamp = self.log_event(kind, title, pid, process, clipboard_timestamp=clip_timestamp)
+            self.echo(f"[EVENT] {kind.capitalize()} event logged at {event_timestamp}")
+            self.stats[kind] += 1
+        except Exception as e:
+            self.echo(f"[ERROR] {kind.capitalize()} event error: {e}")
+
+    def hotkey(self, kind: str):
+        """Thread-safe entry point for hook callbacks ('copy' / 'paste')."""
+        fired_ms = now_epoch_ms()
+        self._loop.call_soon_threadsafe(self._on_hotkey, kind, fired_ms)
+
+    def notify(self, kind: str = None):
+        """Thread-safe change notification ('window' / 'clipboard') from an OS hook."""
+        self._loop.call_soon_threadsafe(self._on_notify)
+
+    def _on_notify(self):
+        self.stats["notifications"] += 1
+        self._wake.set()
+
+    def stop(self):
+        """Thread-safe stop request."""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+
+    # ---------- Zadania ----------
+
+    async def _sleep(self, seconds: float) -> bool:
+        """Waits `seconds` or until woken; returns True when woken early."""
+        try:
+            await asyncio.wait_for(self._wake.wait(), seconds)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self._wake.clear()
+
+    async def _poll(self):
+        interval = self.min_interval
+        while not self._stop.is_set():
+            try:
+                changed = self._check()
+            except Exception as e:
+                self.echo(f"[ERROR] Poll error: {e}")
+                changed = False
+            if not self.event_driven:
+                await self._sleep(self.poll_interval)   # bez powiadomień: stały interwał
+                continue
+            if changed:
+                interval = self.min_interval
+            elif self.source.idle_seconds() >= self.idle_after:
+                interval = self.idle_interval
+            else:
+                interval = min(interval * POLL_BACKOFF, self.max_interval)
+            if await self._sleep(interval):
+                interval = self.min_interval
+
+    async def _history(self):
+        while not self._stop.is_set():
+            try:
+                added = await self._loop.run_in_executor(None, self.sample_history)
+                self.stats["history"] += added or 0
+            except Exception as e:
+                self.echo(f"[ERROR] Browser history error: {e}")
+            try:
+                await asyncio.wait_for(self._stop.wait(), self.history_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run(self, duration: float = None):
+        """Runs until stop() (or for `duration` seconds)."""
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._stop = asyncio.Event()
+        if duration is not None:
+            self._loop.call_later(duration, self._stop.set)
+
+        self.source.add_hotkeys(self.hotkey)
+        self.event_driven = bool(self.source.watch_changes(self.notify))
+        tasks = [asyncio.create_task(self._poll())]
+        if self.sample_history is not None:
+            tasks.append(asyncio.create_task(self._history()))
+        try:
+            await self._stop.wait()
+        finally:
+            self._stop.set()
+            self._wake.set()
+            self.source.remove_hotkeys()
+            self.source.unwatch_changes()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class FakeSource:
+    """
+    Scripted source for tests and demos on any OS.
+
+    `script` is a list of (at_seconds, kind, value) relative to the start:
+    'window' -> (title, pid, process), 'clipboard' -> text, 'idle' -> True/False,
+    'copy' / 'paste' -> None (fired from a timer thread like a real keyboard hook).
+    With `events=True` window/clipboard steps are also notified like OS hooks;
+    with `events=False` the runtime has to find them by polling.
+    """
+
+    def __init__(self, script, events: bool = True):
+        self.script = sorted(script, key=lambda step: step[0])
+        self.events = events
+        self._started = None
+        self._timers = []
+        self._watch_timers = []
+
+    def _start(self):
+        if self._started is None:
+            self._started = time.monotonic()
+
+    def _schedule(self, kinds, callback, timers):
+        self._start()
+        for at, kind, _ in self.script:
+            if kind in kinds:
+                delay = max(0.0, self._started + at - time.monotonic())
+                timer = threading.Timer(delay, callback, args=(kind,))
+                timer.daemon = True
+                timer.start()
+                timers.append(timer)
+
+    def _state(self):
+        elapsed = 0.0 if self._started is None else time.monotonic() - self._started
+        window, clip, idle_since = (None, None, None), None, None
+        for at, kind, value in self.script:
+            if at > elapsed:
+                break
+            if kind == "window":
+                window = value
+            elif kind == "clipboard":
+                clip = value
+            elif kind == "idle":
+                idle_since = at if value else None
+            elif kind in ("copy", "paste"):
+                idle_since = None
+        idle = 0.0 if idle_since is None else elapsed - idle_since
+        return window, clip, idle
+
+    def active_window(self):
+        return self._state()[0]
+
+    def clipboard(self):
+        return self._state()[1]
+
+    def idle_seconds(self) -> float:
+        return self._state()[2]
+
+    def add_hotkeys(self, callback):
+        self._schedule(("copy", "paste"), callback, self._timers)
+
+    def remove_hotkeys(self):
+        for timer in self._timers:
+            timer.cancel()
+        self._timers = []
+
+    def watch_changes(self, callback) -> bool:
+        if not self.events:
+            return False
+        self._schedule(("window", "clipboard"), callback, self._watch_timers)
+        return True
+
+    def unwatch_changes(self):
+        for timer in self._watch_timers:
+            timer.cancel()
+        self._watch_timers = []
+
+    @classmethod
+    def demo(cls, duration: float = 60.0, seed: int = 0, events: bool = True) -> "FakeSource":
+        """Random activity: window switches, copies/pastes and an idle stretch."""
+        rng = random.Random(seed)
+        apps = [("Code.exe", "main.py - Visual Studio Code"), ("opera.exe", "Inbox - Opera"),
+                ("excel.exe", "report.xlsx - Excel"), ("teams.exe", "Chat | Microsoft Teams")]
+        script, t = [], 0.0
+        while t < duration * 0.7:
+            process, title = rng.choice(apps)
+            script.append((t, "window", (title, rng.randint(1000, 9999), process)))
+            if rng.random() < 0.4:
+                script.append((t + 0.3, "clipboard", f"snippet {int(t)}"))
+                script.append((t + 0.3, "copy", None))
+                script.append((t + 1.0, "paste", None))
+            t += rng.uniform(1.0, 4.0)
+        script.append((t, "idle", True))
+        return cls(script, events=events)
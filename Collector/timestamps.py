@@ -0,0 +1,260 @@
+"""
+Shared timestamp handling for collector, ingest and analyzers.
+
+Canonical format: int64 epoch milliseconds (UTC), written at log time.
+Legacy files contain strings in a few fixed formats:
+ - collector:  '2025-10-04 16:48:32'          (naive, UTC)
+ - extension:  '2025-10-04T14:45:08.090Z'     (ISO-8601, UTC)
+ - APP.PY:     '2025-10-04T16:45:08.123456'   (naive, datetime.now(): local time)
+ - explicit offsets like '...+02:00' are honoured.
+The two naive formats are told apart by the separator: naive strings with a
+space are read in `assume_tz` (UTC), naive strings with 'T' (only APP.PY's
+fallback wrote those) in `naive_iso_tz` (local time of this machine).
+A string must end where its format ends; anything after it is rejected.
+
+`parse_timestamps` converts a whole column (mixed ints and strings) to epoch
+ms without per-row format inference; `local_day` buckets by local calendar
+day. pandas is imported lazily so the collector/ingest path stays light.
+"""
+
+import math
+import os
+import time
+from datetime import datetime, time as dtime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+UTC = "UTC"
+LOCAL = "local"   # strefa tej maszyny (z uwzględnieniem zmiany czasu)
+PARSE_CHUNK_ROWS = 100_000   # wierszy tekstowych dekodowanych naraz (pamięć macierzy znaków)
+MIN_EPOCH_MS = 10 ** 9       # liczby krótsze niż 10 cyfr nie są epoch ms
+MAX_EPOCH_MS = 253_402_300_800_000   # 10000-01-01, dalej int64 / daty nie mają sensu
+
+
+def now_epoch_ms() -> int:
+    return time.time_ns() // 1_000_000
+
+
+def local_tz():
+    """
+    Local timezone of this machine with its DST rules (not today's fixed
+    offset): the IANA zone from TZ or /etc/localtime when known, otherwise
+    dateutil's tzlocal() (system rules, also on Windows).
+    """
+    candidates = [os.environ.get("TZ", "").lstrip(":")]
+    try:
+        link = os.path.realpath("/etc/localtime")
+        candidates.append(link.split("zoneinfo/", 1)[1] if "zoneinfo/" in link else "")
+    except OSError:
+        pass
+    for name in candidates:
+        if name:
+            try:
+                return ZoneInfo(name)
+            except (ValueError, OSError):
+                continue
+    from dateutil.tz import tzlocal
+
+    return tzlocal()
+
+
+def parse_timestamp_ms(value, default=None):
+    """Scalar version of `parse_timestamps`, used on the ingest path."""
+    if value is None:
+        return default
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return int(value) if math.isfinite(value) else default  # NaN / inf (np. JSON 1e999)
+    text = str(value).strip()
+    if text.isdigit():
+        return int(text)
+    try:
+        dt = datetime.fromisoformat(text.replace("Z", "+00:00"))
+    except ValueError:
+        return default
+    if dt.tzinfo is None and "T" not in text:
+        dt = dt.replace(tzinfo=timezone.utc)   # kolektor: naiwny UTC
+    return int(dt.timestamp() * 1000)          # naiwny 'T' (APP.PY): czas lokalny
+
+
+def _days_from_civil(y, m, d):
+    """Days since 1970-01-01 for proleptic Gregorian dates (vectorised)."""
+    y = y - (m <= 2)
+    era = y // 400
+    yoe = y - era * 400
+    doy = (153 * (m + 12 * (m <= 2) - 3) + 2) // 5 + d - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    return era * 146097 + doe - 719468
+
+
+def _localize(ms, tz):
+    """Wall-clock epoch ms in `tz` (or LOCAL) -> UTC epoch ms (float, NaN if nonexistent)."""
+    import numpy as np
+    import pandas as pd
+
+    wall = pd.DatetimeIndex(pd.to_datetime(ms, unit="ms"))
+    utc = wall.tz_localize(local_tz() if tz == LOCAL else tz, ambiguous="NaT", nonexistent="NaT").tz_convert(None)
+    return np.asarray((utc - pd.Timestamp("1970-01-01")) // pd.Timedelta(milliseconds=1), dtype="float64")
+
+
+def parse_timestamps(values, assume_tz: str = UTC, naive_iso_tz: str = LOCAL):
+    """
+    Converts a column of timestamps to nullable int64 epoch milliseconds.
+
+    Epoch ms (numbers or digit-only strings) go through pd.to_numeric.
+    Only the remaining strings are decoded at fixed character positions
+    (YYYY-MM-DD?HH:MM:SS, optional .f to .fffffffff, optional Z / +HH:MM)
+    on a numpy code-point matrix, PARSE_CHUNK_ROWS rows at a time. Strings
+    with anything after that format, or impossible dates, are rejected.
+
+    Args:
+        values: Series/array of epoch ms ints and/or legacy strings
+        assume_tz (str): Timezone of naive 'YYYY-MM-DD HH:MM:SS' strings (collector writes UTC)
+        naive_iso_tz (str): Timezone of naive 'YYYY-MM-DDTHH:MM:SS' strings (APP.PY wrote local time)
+
+    Returns:
+        pd.Series: dtype 'Int64', <NA> where the value could not be parsed
+    """
+    import numpy as np
+    import pandas as pd
+
+    s = pd.Series(values)
+    result = pd.Series(pd.NA, index=s.index, dtype="Int64")
+
+    # Epoch ms zapisane jako liczba (także jako tekst z samych cyfr)
+    number = pd.to_numeric(s, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    with np.errstate(invalid="ignore"):
+        numeric = np.isfinite(number) & (number >= MIN_EPOCH_MS) & (number < MAX_EPOCH_MS) & (number == np.floor(number))
+    if pd.api.types.is_numeric_dtype(s):
+        result[numeric] = s[numeric].astype("int64").to_numpy()
+        return result
+    if numeric.any():
+        result[numeric] = number[numeric].astype("int64")
+
+    rest = np.flatnonzero(~numeric & s.notna().to_numpy())
+    for lo in range(0, len(rest), PARSE_CHUNK_ROWS):
+        positions = rest[lo:lo + PARSE_CHUNK_ROWS]
+        ms, ok = _decode_strings(s.iloc[positions].to_numpy(dtype=object), assume_tz, naive_iso_tz)
+        if ok.any():
+            result.iloc[positions[ok]] = ms[ok]
+    return result
+
+
+def _decode_strings(texts, assume_tz: str, naive_iso_tz: str):
+    """Fixed-position decoder for one chunk of strings; returns (epoch ms, valid mask)."""
+    import numpy as np
+    import pandas as pd
+
+    n = len(texts)
+    width = 40   # najdłuższy poprawny zapis ma 35 znaków, dłuższe i tak odpadają
+    text = np.asarray(texts, dtype=f"U{width}")
+    lens = np.char.str_len(text)
+    c = text.view(np.uint32).reshape(n, width).astype(np.int32)
+    dig = c - ord("0")
+    is_dig = (dig >= 0) & (dig <= 9)
+
+    def num(a, b):
+        out = np.zeros(n, dtype=np.int64)
+        for i in range(a, b):
+            out = out * 10 + dig[:, i]
+        return out
+
+    # YYYY-MM-DD?HH:MM:SS
+    date_ok = (
+        (lens >= 19)
+        & is_dig[:, [0, 1, 2, 3, 5, 6, 8, 9, 11, 12, 14, 15, 17, 18]].all(axis=1)
+        & (c[:, 4] == ord("-")) & (c[:, 7] == ord("-"))
+        & ((c[:, 10] == ord(" ")) | (c[:, 10] == ord("T")))
+        & (c[:, 13] == ord(":")) & (c[:, 16] == ord(":"))
+    )
+    year, month, day = num(0, 4), num(5, 7), num(8, 10)
+    hour, minute, second = num(11, 13), num(14, 16), num(17, 19)
+    date_ok &= (month >= 1) & (month <= 12) & (hour <= 23) & (minute <= 59) & (second <= 60)
+
+    # Dzień musi istnieć w tym miesiącu (2025-02-30 nie staje się 2 marca)
+    first = _days_from_civil(year, month, 1)
+    month_days = _days_from_civil(year + (month == 12), month % 12 + 1, 1) - first
+    date_ok &= (day >= 1) & (day <= month_days)
+
+    ms = ((first + day - 1) * 86_400 + hour * 3600 + minute * 60 + second) * 1000
+
+    # Ułamek sekundy: 1-9 cyfr po kropce, liczą się pierwsze 3
+    has_frac = c[:, 19] == ord(".")
+    run = has_frac.copy()
+    frac_digits = np.zeros(n, dtype=np.int64)
+    for i in range(20, 29):
+        run &= is_dig[:, i]
+        frac_digits += run
+        if i < 23:
+            ms += np.where(run, dig[:, i] * 10 ** (22 - i), 0)
+    date_ok &= ~has_frac | (frac_digits > 0)
+    end = 19 + np.where(has_frac, 1 + frac_digits, 0)   # tu kończy się data z czasem
+
+    # Strefa: 'Z' lub +HH:MM / +HHMM zaraz po czasie i nic więcej
+    rows = np.arange(n)
+    is_z = (lens == end + 1) & (c[rows, np.clip(end, 0, width - 1)] == ord("Z"))
+    offset_ms = np.zeros(n, dtype=np.int64)
+    has_offset = np.zeros(n, dtype=bool)
+    for span, colon in ((6, True), (5, False)):
+        p = np.clip(lens - span, 0, width - 1)
+        sign = c[rows, p]
+        ok = (lens - span == end) & ((sign == ord("+")) | (sign == ord("-"))) & ~has_offset
+        hh = dig[rows, np.clip(p + 1, 0, width - 1)] * 10 + dig[rows, np.clip(p + 2, 0, width - 1)]
+        mm_at = p + (4 if colon else 3)
+        mm = dig[rows, np.clip(mm_at, 0, width - 1)] * 10 + dig[rows, np.clip(mm_at + 1, 0, width - 1)]
+        ok &= is_dig[rows, np.clip(p + 1, 0, width - 1)] & is_dig[rows, np.clip(p + 2, 0, width - 1)]
+        ok &= is_dig[rows, np.clip(mm_at, 0, width - 1)] & is_dig[rows, np.clip(mm_at + 1, 0, width - 1)]
+        if colon:
+            ok &= c[rows, np.clip(p + 3, 0, width - 1)] == ord(":")
+        offset_ms = np.where(ok, np.where(sign == ord("-"), -1, 1) * (hh * 60 + mm) * 60_000, offset_ms)
+        has_offset |= ok
+    ms -= offset_ms
+    date_ok &= (lens == end) | is_z | has_offset
+
+    naive = date_ok & ~is_z & ~has_offset
+    for separator, tz in ((" ", assume_tz), ("T", naive_iso_tz)):
+        mask = naive & (c[:, 10] == ord(separator))
+        if tz != UTC and mask.any():
+            local = _localize(ms[mask], tz)
+            valid = ~np.isnan(local)   # godzina nieistniejąca / niejednoznaczna przy zmianie czasu
+            ms[np.flatnonzero(mask)[valid]] = local[valid].astype(np.int64)
+            date_ok[np.flatnonzero(mask)[~valid]] = False
+    return ms, date_ok
+
+
+def to_datetime(epoch_ms, tz=None):
+    """Epoch ms -> tz-aware datetimes in `tz` (default: local timezone)."""
+    import pandas as pd
+
+    dt = pd.to_datetime(pd.Series(epoch_ms).astype("float64"), unit="ms", utc=True)
+    return dt.dt.tz_convert(tz or local_tz())
+
+
+def local_day(epoch_ms, tz=None):
+    """Local calendar day (datetime.date) of every epoch ms value."""
+    return to_datetime(epoch_ms, tz).dt.date
+
+
+def local_dates(epoch_ms, tz=None):
+    """Local calendar day of every epoch ms value as numpy datetime64[D] (no Python objects)."""
+    return to_datetime(epoch_ms, tz).dt.tz_localize(None).to_numpy().astype("datetime64[D]")
+
+
+def day_bounds_ms(day, tz=None):
+    """[start, end) of a local calendar day as epoch ms."""
+    if isinstance(tz, str):
+        tz = ZoneInfo(tz)
+    tz = tz or local_tz()
+    start = datetime.combine(day, dtime.min, tz)
+    end = datetime.combine(day + timedelta(days=1), dtime.min, tz)
+    return int(start.timestamp() * 1000), int(end.timestamp() * 1000)
+
+
+def load_timestamp_column(df, ts_col: str = "timestamp", tz=None, assume_tz: str = UTC):
+    """
+    Returns a copy of `df` with int64 'ts_ms', `ts_col` replaced by local
+    tz-aware datetimes and unparseable rows dropped.
+    """
+    ms = parse_timestamps(df[ts_col], assume_tz=assume_tz)
+    df = df[ms.notna().to_numpy()].copy()
+    df["ts_ms"] = ms.dropna().astype("int64").to_numpy()
+    df[ts_col] = to_datetime(df["ts_ms"], tz)
+    return df
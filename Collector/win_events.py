@@ -0,0 +1,107 @@
+"""
+Windows change notifications for the collector runtime (no polling).
+
+One thread pumps messages for:
+ - SetWinEventHook(EVENT_SYSTEM_FOREGROUND) - another window became active,
+ - SetWinEventHook(EVENT_OBJECT_NAMECHANGE) - filtered to the foreground
+   window, so tab/document switches that only change the title are seen,
+ - AddClipboardFormatListener on a message-only window - WM_CLIPBOARDUPDATE
+   (also mouse / menu copies that the Ctrl+C hotkey does not catch).
+
+Callbacks only call `callback(kind)`; the runtime marshals it into its loop.
+"""
+
+import ctypes
+import threading
+from ctypes import wintypes
+
+import win32api
+import win32gui
+
+EVENT_SYSTEM_FOREGROUND = 0x0003
+EVENT_OBJECT_NAMECHANGE = 0x800C
+WINEVENT_OUTOFCONTEXT = 0x0000
+WINEVENT_SKIPOWNPROCESS = 0x0002
+OBJID_WINDOW = 0
+WM_CLIPBOARDUPDATE = 0x031D
+WM_QUIT = 0x0012
+HWND_MESSAGE = -3
+
+WinEventProc = ctypes.WINFUNCTYPE(
+    None, wintypes.HANDLE, wintypes.DWORD, wintypes.HWND,
+    wintypes.LONG, wintypes.LONG, wintypes.DWORD, wintypes.DWORD,
+)
+
+
+class WindowsWatcher(threading.Thread):
+    """Message-loop thread delivering 'window' / 'clipboard' notifications."""
+
+    def __init__(self, callback):
+        super().__init__(name="win-events", daemon=True)
+        self.callback = callback
+        self.thread_id = None
+        self.started_ok = False
+        self._ready = threading.Event()
+
+    def start_and_wait(self, timeout: float = 2.0) -> bool:
+        """Starts the thread; True once the hooks are installed."""
+        self.start()
+        self._ready.wait(timeout)
+        return self.started_ok
+
+    def stop(self):
+        if self.thread_id is not None:
+            win32api.PostThreadMessage(self.thread_id, WM_QUIT, 0, 0)
+
+    def run(self):
+        user32 = ctypes.windll.user32
+        user32.SetWinEventHook.restype = wintypes.HANDLE
+        user32.SetWinEventHook.argtypes = [
+            wintypes.DWORD, wintypes.DWORD, wintypes.HMODULE, WinEventProc,
+            wintypes.DWORD, wintypes.DWORD, wintypes.DWORD,
+        ]
+        user32.UnhookWinEvent.argtypes = [wintypes.HANDLE]
+        self.thread_id = win32api.GetCurrentThreadId()
+
+        def on_win_event(hook, event, hwnd, id_object, id_child, thread, event_ms):
+            if event == EVENT_SYSTEM_FOREGROUND:
+                self.callback("window")
+            elif id_object == OBJID_WINDOW and hwnd and hwnd == win32gui.GetForegroundWindow():
+                self.callback("window")   # zmiana tytułu aktywnego okna
+
+        proc = WinEventProc(on_win_event)   # referencja musi żyć tak długo jak hook
+        flags = WINEVENT_OUTOFCONTEXT | WINEVENT_SKIPOWNPROCESS
+        hooks = [
+            user32.SetWinEventHook(EVENT_SYSTEM_FOREGROUND, EVENT_SYSTEM_FOREGROUND, None, proc, 0, 0, flags),
+            user32.SetWinEventHook(EVENT_OBJECT_NAMECHANGE, EVENT_OBJECT_NAMECHANGE, None, proc, 0, 0, flags),
+        ]
+
+        wc = win32gui.WNDCLASS()
+        wc.lpszClassName = "ProcessBotClipboardListener"
+        wc.hInstance = win32api.GetModuleHandle(None)
+        wc.lpfnWndProc = {WM_CLIPBOARDUPDATE: lambda hwnd, msg, wparam, lparam: self.callback("clipboard") or 0}
+        hwnd = None
+        try:
+            atom = win32gui.RegisterClass(wc)
+            hwnd = win32gui.CreateWindow(atom, "ProcessBot", 0, 0, 0, 0, 0, HWND_MESSAGE, 0, wc.hInstance, None)
+            clipboard_ok = bool(user32.AddClipboardFormatListener(hwnd))
+        except Exception as e:
+            print(f"[ERROR] Clipboard listener: {e}")
+            clipboard_ok = False
+
+        # Bez obu źródeł powiadomień runtime wraca do stałego odpytywania
+        self.started_ok = all(hooks) and clipboard_ok
+        self._ready.set()
+        try:
+            win32gui.PumpMessages()   # kończy się na WM_QUIT
+        finally:
+            for hook in hooks:
+                if hook:
+                    user32.UnhookWinEvent(hook)
+            if hwnd:
+                user32.RemoveClipboardFormatListener(hwnd)
+                win32gui.DestroyWindow(hwnd)
+            try:
+                win32gui.UnregisterClass(wc.lpszClassName, wc.hInstance)
+            except Exception:
+                pass
@@ -0,0 +1,218 @@
+"""
+Asynchronous ingest server for the Time-tracker extension (aiohttp).
+
+Exposes the same `/log` contract as APP.PY:
+    POST /log  {"domain": ..., "seconds": ..., "eventType": ..., "ts": ..., "id": ... (optional)}
+    -> {"status": "ok"} or {"status": "error", "message": ...}
+
+Handlers never touch the disk: accepted events go to a bounded asyncio queue
+and a single writer task appends them to data/data_html.csv in batches
+(in a worker thread, through one long-lived handle). When the queue is full
+the server answers 503 with Retry-After instead of piling up memory. A batch
+whose write fails is cut back from the file and retried; if it still cannot
+be written its ids are released and the events are counted as `lost` in
+/stats.
+
+Run it separately from the dashboard:
+    python -m Ingest.async_server --port 5001
+"""
+
+import argparse
+import asyncio
+import csv
+import os
+from pathlib import Path
+
+from aiohttp import web
+
+from Collector.csv_writer import repair_torn_tail
+from Collector.timestamps import now_epoch_ms, parse_timestamp_ms
+from Ingest.dedupe import RecentIds
+
+CSV_FILE = "data/data_html.csv"
+CSV_HEADER = ["eventType", "domain", "seconds", "timestamp"]
+QUEUE_SIZE = 10_000     # max events waiting for the disk
+MAX_BATCH = 2_000       # max events written per batch
+WRITE_RETRIES = 5       # próby zapisu jednej partii (odstęp 0.5 s, 1 s, 2 s, ...)
+
+CORS_HEADERS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Methods": "POST, OPTIONS",
+    "Access-Control-Allow-Headers": "Content-Type",
+}
+
+QUEUE_KEY = web.AppKey("queue", asyncio.Queue)
+STATS_KEY = web.AppKey("stats", dict)
+SEEN_KEY = web.AppKey("seen", RecentIds)
+
+
+class BatchCsvSink:
+    """Long-lived CSV handle written from a worker thread."""
+
+    def __init__(self, csv_path: str):
+        self.path = Path(csv_path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        repair_torn_tail(self.path)
+        self.handle = None
+        self._open()
+
+    def _open(self):
+        is_new = not self.path.exists() or self.path.stat().st_size == 0
+        self.handle = open(self.path, "a", newline="", encoding="utf-8", buffering=256 * 1024)
+        self.writer = csv.writer(self.handle)
+        if is_new:
+            self.writer.writerow(CSV_HEADER)
+            self.handle.flush()
+        self.committed = self.path.stat().st_size   # koniec ostatniej pełnej partii
+
+    def write_batch(self, rows):
+        if self.handle is None:
+            self._open()
+        try:
+            self.writer.writerows(rows)
+            self.handle.flush()
+            os.fsync(self.handle.fileno())
+        except Exception:
+            self._rollback()
+            raise
+        self.committed = os.fstat(self.handle.fileno()).st_size
+
+    def _rollback(self):
+        """Drops a half-written batch so a retry does not duplicate its rows."""
+        handle, self.handle = self.handle, None
+        try:
+            handle.close()   # dopisuje resztę bufora, którą i tak zaraz ucinamy
+        except Exception:
+            pass
+        try:
+            os.truncate(self.path, self.committed)
+        except OSError:
+            pass
+
+    def close(self):
+        if self.handle is not None:
+            self.handle.close()
+
+
+def event_to_row(data: dict) -> list:
+    """Same defaults as APP.PY /log; `ts` is stored as epoch ms."""
+    return [
+        data.get("eventType", "unknown"),
+        data.get("domain", "unknown"),
+        data.get("seconds", 0),
+        parse_timestamp_ms(data.get("ts"), default=now_epoch_ms()),
+    ]
+
+
+async def log_time(request: web.Request) -> web.Response:
+    try:
+        data = await request.json()
+    except Exception:
+        data = None
+    if not data or not isinstance(data, dict):
+        return web.json_response({"status": "error", "message": "Brak danych"}, status=400, headers=CORS_HEADERS)
+
+    event_id = data.get("id")
+    if event_id is not None and not request.app[SEEN_KEY].claim(event_id):
+        request.app[STATS_KEY]["duplicates"] += 1   # powtórka już zapisanego przedziału
+        return web.json_response({"status": "ok", "duplicate": True}, headers=CORS_HEADERS)
+
+    queue = request.app[QUEUE_KEY]
+    try:
+        queue.put_nowait((event_to_row(data), event_id))
+    except asyncio.QueueFull:
+        if event_id is not None:
+            request.app[SEEN_KEY].discard(event_id)
+        request.app[STATS_KEY]["rejected"] += 1
+        headers = dict(CORS_HEADERS, **{"Retry-After": "1"})
+        return web.json_response({"status": "error", "message": "Serwer przeciążony"}, status=503, headers=headers)
+
+    request.app[STATS_KEY]["accepted"] += 1
+    return web.json_response({"status": "ok"}, headers=CORS_HEADERS)
+
+
+async def log_options(request: web.Request) -> web.Response:
+    return web.Response(status=204, headers=CORS_HEADERS)
+
+
+async def stats(request: web.Request) -> web.Response:
+    data = dict(request.app[STATS_KEY])
+    data["queued"] = request.app[QUEUE_KEY].qsize()
+    return web.json_response(data)
+
+
+async def write_with_retry(app: web.Application, sink: BatchCsvSink, items) -> bool:
+    """Writes one batch, retrying with backoff; on final failure releases its ids."""
+    loop = asyncio.get_running_loop()
+    rows = [row for row, _ in items]
+    for attempt in range(WRITE_RETRIES):
+        try:
+            await loop.run_in_executor(None, sink.write_batch, rows)
+            app[STATS_KEY]["written"] += len(rows)
+            return True
+        except Exception as e:
+            print(f"[INGEST] Błąd zapisu (próba {attempt + 1}/{WRITE_RETRIES}): {e}")
+            if attempt + 1 < WRITE_RETRIES:
+                await asyncio.sleep(0.5 * 2 ** attempt)   # kolejka w tym czasie się zapełnia -> 503
+    # Nie zapisane: id nie mogą blokować ponownego wysłania tych przedziałów
+    for _, event_id in items:
+        if event_id is not None:
+            app[SEEN_KEY].discard(event_id)
+    app[STATS_KEY]["lost"] += len(rows)
+    return False
+
+
+async def writer_task(app: web.Application, sink: BatchCsvSink):
+    """Drains the queue in batches; disk writes run in the default executor."""
+    queue = app[QUEUE_KEY]
+    while True:
+        items = [await queue.get()]
+        while len(items) < MAX_BATCH and not queue.empty():
+            items.append(queue.get_nowait())
+        try:
+            await write_with_retry(app, sink, items)
+        finally:
+            for _ in items:
+                queue.task_done()
+
+
+def create_app(csv_path: str = CSV_FILE, queue_size: int = QUEUE_SIZE) -> web.Application:
+    app = web.Application()
+    app[QUEUE_KEY] = asyncio.Queue(maxsize=queue_size)
+    app[STATS_KEY] = {"accepted": 0, "rejected": 0, "duplicates": 0, "written": 0, "lost": 0}
+    app[SEEN_KEY] = RecentIds()
+
+    app.router.add_post("/log", log_time)
+    app.router.add_route("OPTIONS", "/log", log_options)
+    app.router.add_get("/stats", stats)
+
+    async def writer_ctx(app):
+        sink = BatchCsvSink(csv_path)
+        task = asyncio.create_task(writer_task(app, sink))
+        yield
+        # Dopisz to, co zostało w kolejce, zanim zamkniemy plik
+        await app[QUEUE_KEY].join()
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        sink.close()
+
+    app.cleanup_ctx.append(writer_ctx)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Async ingest server for /log events")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5001)
+    parser.add_argument("--csv", default=CSV_FILE)
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE)
+    args = parser.parse_args()
+
+    web.run_app(create_app(args.csv, args.queue_size), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
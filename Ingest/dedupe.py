@@ -0,0 +1,36 @@
+"""
+Recently seen event ids for `/log` (APP.PY and Ingest.async_server).
+
+The extension sends every closed interval with an `id` and retries until it
+gets a 2xx; if the row was written but the response got lost, the retry
+carries the same id and is acknowledged without writing it again.
+"""
+
+import threading
+from collections import OrderedDict
+
+MAX_IDS = 50_000
+
+
+class RecentIds:
+    """Bounded, thread-safe set of ids (oldest forgotten first)."""
+
+    def __init__(self, max_ids: int = MAX_IDS):
+        self.max_ids = max_ids
+        self._ids = OrderedDict()
+        self._lock = threading.Lock()
+
+    def claim(self, event_id) -> bool:
+        """Marks `event_id` as seen; False if it already was (a repeat)."""
+        with self._lock:
+            if event_id in self._ids:
+                return False
+            self._ids[event_id] = None
+            while len(self._ids) > self.max_ids:
+                self._ids.popitem(last=False)
+            return True
+
+    def discard(self, event_id):
+        """Forgets an id whose event could not be stored, so a retry is accepted."""
+        with self._lock:
+            self._ids.pop(event_id, None)
@@ -0,0 +1,43 @@
+"""
+Compact in-memory representation of analyzer DataFrames.
+
+Repeated strings (process, title, domain, event type) become categoricals,
+ids become nullable Int32 (missing ids stay <NA>) and durations float32. `memory_footprint` reports what
+a frame actually costs, per column, so the budget can be checked.
+"""
+
+import pandas as pd
+
+
+def compact_frame(
+    df: pd.DataFrame,
+    categories=(),
+    int32=(),
+    float32=(),
+) -> pd.DataFrame:
+    """Converts the listed columns in place (missing columns are skipped)."""
+    for col in categories:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+    for col in int32:
+        if col in df.columns:
+            values = pd.to_numeric(df[col], errors="coerce")
+            # brak / nieliczbowe id zostają <NA> (0 to prawdziwy pid)
+            df[col] = values.where(values == values.round()).astype("Int32")
+    for col in float32:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("float32")
+    return df
+
+
+def memory_footprint(df: pd.DataFrame) -> dict:
+    """Bytes used per column (deep, including strings) and in total."""
+    usage = df.memory_usage(index=True, deep=True)
+    report = {col: int(size) for col, size in usage.items()}
+    report["total"] = int(usage.sum())
+    return report
+
+
+def format_footprint(name: str, df: pd.DataFrame) -> str:
+    report = memory_footprint(df)
+    return f"{name}: {len(df)} wierszy, {report['total'] / 1024 / 1024:.2f} MB"
@@ -0,0 +1,274 @@
+"""
+Multi-step navigation paths (processes / domains) for the Sankey view.
+
+For every stream and local day a prefix tree counts how often each path of
+up to `max_depth` consecutive, distinct values occurred. The tree is updated
+incrementally: the number of rows walked per day is stored, and a day whose
+count did not change is skipped. When the only new rows of the latest day
+are newer than the stream watermark, they are appended to its tree (the last
+`max_depth - 1` values of the day are kept so paths continue across
+updates). Any other change, such as rows arriving late with older or equal
+timestamps, re-walks that whole day, so the result always equals a full
+rebuild. Day boundaries come from one pass over the sorted frame, so an
+unchanged day costs nothing beyond its row count.
+
+Per-day trees keep every path (count >= 1): a workflow done once a day adds
+up over the selected days, and `min_support` is applied in `sankey()` to
+the merged tree. The store is bounded by age: days older than MAX_DAYS
+before the newest one are dropped (and ignored by `update`).
+
+State is persisted as compact JSON (node = [count, {label: node}]) and
+`sankey()` turns the selected days into d3-sankey {nodes, links}.
+"""
+
+import json
+import os
+import threading
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+
+from Collector.timestamps import local_dates
+
+MAX_DEPTH = 4            # długość ścieżki (liczba kroków)
+MAX_DAYS = 400           # ile dni wstecz trzymamy drzewa (limit rozmiaru stanu)
+STATE_VERSION = 2        # 1: zamknięte dni przycinane przy zapisie -> liczymy od nowa
+FLOW_STATE_FILE = "data/flow_paths.json"
+
+
+class PathTrie:
+    """Prefix tree; `count` = number of occurrences of the path ending here."""
+
+    __slots__ = ("count", "children")
+
+    def __init__(self, count: int = 0):
+        self.count = count
+        self.children = {}
+
+    def child(self, label):
+        node = self.children.get(label)
+        if node is None:
+            node = self.children[label] = PathTrie()
+        return node
+
+    def add_suffixes(self, window):
+        """Counts every suffix of `window` (paths ending at its last value)."""
+        for start in range(len(window)):
+            node = self
+            for label in window[start:]:
+                node = node.child(label)
+            node.count += 1
+
+    def merge(self, other: "PathTrie", max_depth: int):
+        if max_depth <= 0:
+            return
+        for label, theirs in other.children.items():
+            mine = self.child(label)
+            mine.count += theirs.count
+            mine.merge(theirs, max_depth - 1)
+
+    def to_json(self):
+        return [self.count, {label: node.to_json() for label, node in self.children.items()}]
+
+    @classmethod
+    def from_json(cls, data) -> "PathTrie":
+        node = cls(data[0])
+        node.children = {label: cls.from_json(child) for label, child in data[1].items()}
+        return node
+
+
+class FlowPathStore:
+    """Per-stream, per-day path tries with incremental updates."""
+
+    def __init__(self, state_file: str = FLOW_STATE_FILE, max_depth: int = MAX_DEPTH):
+        self.state_file = Path(state_file)
+        self.max_depth = max_depth
+        self.streams = {}
+        self._encoded = {}   # (stream, dzień) -> to_json() niezmienionego drzewa
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return
+        if state.get("max_depth") != self.max_depth or state.get("version") != STATE_VERSION:
+            return  # inna głębokość / format -> liczymy od nowa
+        for name, stream in state.get("streams", {}).items():
+            self.streams[name] = {
+                "watermark": stream["watermark"],
+                "tail": stream["tail"],
+                "tail_day": stream["tail_day"],
+                "day_rows": stream.get("day_rows", {}),  # brak -> każdy dzień przeliczony raz
+                "days": {day: PathTrie.from_json(trie) for day, trie in stream["days"].items()},
+            }
+            self._encoded.update({(name, day): trie for day, trie in stream["days"].items()})
+
+    def _encode(self, name: str, day: str, trie: PathTrie):
+        key = (name, day)
+        if key not in self._encoded:
+            self._encoded[key] = trie.to_json()
+        return self._encoded[key]
+
+    def save(self):
+        with self._lock:
+            state = {
+                "version": STATE_VERSION,
+                "max_depth": self.max_depth,
+                "streams": {
+                    name: {
+                        "watermark": stream["watermark"],
+                        "tail": stream["tail"],
+                        "tail_day": stream["tail_day"],
+                        "day_rows": stream["day_rows"],
+                        "days": {day: self._encode(name, day, trie) for day, trie in stream["days"].items()},
+                    }
+                    for name, stream in self.streams.items()
+                },
+            }
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_file.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(json.dumps(state, ensure_ascii=False, separators=(",", ":")))  # dumps w C, dump nie
+        os.replace(tmp, self.state_file)
+
+    def _walk(self, trie: PathTrie, tail: list, labels) -> list:
+        """Adds the paths ending at every label; returns the new tail."""
+        for label in labels:
+            if tail and tail[-1] == label:
+                continue
+            tail.append(label)
+            tail = tail[-self.max_depth:]
+            trie.add_suffixes(tail)
+        return tail
+
+    def update(self, stream_name: str, df, column: str) -> int:
+        """
+        Brings the stream up to date with `df` (the whole source, any order).
+        Returns the number of rows walked.
+        """
+        with self._lock:
+            stream = self.streams.setdefault(
+                stream_name, {"watermark": None, "tail": [], "tail_day": None, "day_rows": {}, "days": {}}
+            )
+            rows = df[["ts_ms", column]].dropna(subset=[column]).sort_values("ts_ms", kind="stable")
+            if rows.empty:
+                return 0
+
+            # granice dni raz dla całej ramki: (dzień, pozycje wierszy w kolejności ts)
+            ts = rows["ts_ms"].to_numpy(dtype=np.int64)
+            dates = local_dates(ts)
+            order = np.argsort(dates, kind="stable")
+            unique_days, starts, counts = np.unique(dates[order], return_index=True, return_counts=True)
+            values = rows[column].to_numpy()
+            cutoff = str(unique_days[-1] - np.timedelta64(MAX_DAYS, "D"))
+            watermark = stream["watermark"]
+            walked = 0
+
+            for day, start, count in zip(unique_days.astype(str), starts.tolist(), counts.tolist()):
+                seen = stream["day_rows"].get(day, 0)
+                if count == seen or day < cutoff:
+                    continue
+                positions = order[start:start + count]
+                day_labels = [str(v) for v in values[positions]]
+                old = int((ts[positions] <= watermark).sum()) if watermark is not None else 0
+
+                if day == stream["tail_day"] and old == seen and day in stream["days"]:
+                    # tylko nowsze wiersze ostatniego dnia: kontynuujemy ścieżki od ogona
+                    new_labels = day_labels[old:]
+                    tail = self._walk(stream["days"][day], list(stream["tail"]), new_labels)
+                    walked += len(new_labels)
+                else:
+                    # nowy dzień albo spóźnione wiersze (starsze / równe watermarkowi): cały dzień od nowa
+                    trie = stream["days"][day] = PathTrie()
+                    tail = self._walk(trie, [], day_labels)
+                    walked += count
+                stream["day_rows"][day] = count
+                self._encoded.pop((stream_name, day), None)
+
+                # ścieżki nie przechodzą przez północ: ogon tylko z najnowszego dnia
+                if stream["tail_day"] is None or day >= stream["tail_day"]:
+                    stream["tail"], stream["tail_day"] = tail[-(self.max_depth - 1):], day
+
+            for day in [d for d in stream["days"] if d < cutoff]:
+                del stream["days"][day]
+                stream["day_rows"].pop(day, None)
+                self._encoded.pop((stream_name, day), None)
+            stream["watermark"] = int(ts[-1]) if watermark is None else max(watermark, int(ts[-1]))
+            return walked
+
+    def sankey(
+        self,
+        stream_name: str,
+        days: int = 7,
+        depth: int = None,
+        min_support: int = 2,
+        start: str = None,
+        max_paths: int = 50,
+    ) -> dict:
+        """
+        d3-sankey data for paths of exactly `depth` steps over the last `days`
+        days (0 = all). Nodes are (step, label); `start` fixes the first step.
+        """
+        depth = min(depth or self.max_depth, self.max_depth)
+        first_day = str(date.today() - timedelta(days=days - 1)) if days else ""
+
+        merged = PathTrie()
+        with self._lock:
+            stream = self.streams.get(stream_name, {"days": {}})
+            for day, trie in stream["days"].items():
+                if day >= first_day:
+                    merged.merge(trie, depth)
+
+        root = merged
+        prefix = []
+        if start is not None:
+            root = merged.children.get(start, PathTrie())
+            prefix = [start]
+
+        # zbieramy pełne ścieżki, pomijając gałęzie poniżej min_support (po zsumowaniu dni)
+        paths = []
+        stack = [(root, prefix)]
+        while stack:
+            node, path = stack.pop()
+            if len(path) == depth:
+                paths.append((node.count, path))
+                continue
+            for label, child in node.children.items():
+                if child.count >= min_support:
+                    stack.append((child, path + [label]))
+        paths.sort(key=lambda p: p[0], reverse=True)
+        paths = paths[:max_paths]
+
+        index, nodes, links = {}, [], {}
+        for count, path in paths:
+            ids = []
+            for step, label in enumerate(path):
+                key = (step, label)
+                if key not in index:
+                    index[key] = len(nodes)
+                    nodes.append({"name": label, "step": step})
+                ids.append(index[key])
+            for source, target in zip(ids, ids[1:]):
+                links[(source, target)] = links.get((source, target), 0) + count
+
+        return {
+            "nodes": nodes,
+            "links": [{"source": s, "target": t, "value": v} for (s, t), v in links.items()],
+        }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_flow_store() -> FlowPathStore:
+    """Shared store (loaded from FLOW_STATE_FILE on first use)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = FlowPathStore()
+        return _store
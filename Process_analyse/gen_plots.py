@@ -1,28 +1,41 @@
 from .proc_analysis import ProcessAnalyzer
 from .web_analys import DomainTransitionAnalyzer
+from .flow_paths import get_flow_store
+from Collector.timestamps import now_epoch_ms
 import time
 from datetime import date
 
-def generate_plots():
-    """Funkcja generująca wykresy w tle co 10 sekund"""
+def generate_plots(status=None):
+    """Funkcja generująca wykresy w tle co 5 minut (`status` - opcjonalny słownik dla /healthz)"""
     SLEEP_INTERVAL = 300  # sekund
     while True:
         try:
             analyzer = ProcessAnalyzer("data/windows.csv")
+            print(analyzer)
             analyzer.calculate_time_spent()
 
             analyzer.plot_time_spent("plotly/czas_procesy.html")
             analyzer.plot_process_network("plotly/siec_titles.html", 'title')
             analyzer.plot_process_network("plotly/siec_process.html")
+
+            flows = get_flow_store()
+            flows.update("process", analyzer.data, "process")
             
 
             analyzer = DomainTransitionAnalyzer("./data/data_html.csv")
+            print(analyzer)
             transitions = analyzer.count_transitions(analyzer.data, main_col="domain")
             transitions.head()
 
             analyzer.plot_heatmap(main_col="domain")
             analyzer.plot_heatmap(main_col="domain", day=date.today())  
             analyzer.plot_total_time_barplot()
+
+            flows.update("domain", analyzer.data, "domain")
+            flows.save()
+            if status is not None:
+                status["renders"] = status.get("renders", 0) + 1
+                status["last_render_ms"] = now_epoch_ms()
             time.sleep(SLEEP_INTERVAL)
         except Exception as e:
             print(f"Błąd podczas generowania wykresów: {e}")
@@ -5,24 +5,40 @@ from datetime import timedelta
 import networkx as nx
 import time
 
+from Collector.timestamps import load_timestamp_column
+from .query_cache import cached_query
+from .compact import compact_frame, format_footprint, memory_footprint
+
 class ProcessAnalyzer:
     def __init__(self, csv_path: str):
         """Inicjalizacja: wczytanie danych z CSV."""
-        self.data = pd.read_csv(csv_path)
-        self.data['timestamp'] = pd.to_datetime(self.data['timestamp'])
-        self.data.sort_values(by='timestamp', inplace=True)
+        # timestamp -> lokalny czas (tz-aware), ts_ms -> int64 epoch ms
+        self.source = str(csv_path)
+        data = pd.read_csv(csv_path, dtype={'title': 'category', 'process': 'category'})
+        self.data = compact_frame(load_timestamp_column(data), categories=['title', 'process'], int32=['pid'])
+        self.data.sort_values(by='ts_ms', kind='stable', inplace=True)
+
+    def memory_footprint(self) -> dict:
+        """Zużycie pamięci przez dane (bajty na kolumnę i łącznie)."""
+        return memory_footprint(self.data)
+
+    def __repr__(self):
+        return f"<ProcessAnalyzer {format_footprint(self.source, self.data)}>"
     
     def calculate_time_spent(self, column: str = 'process') -> pd.DataFrame:
         """Liczy czas spędzony w każdym procesie na podstawie różnicy czasów."""
-        df = self.data.copy()
-        df['next_timestamp'] = df['timestamp'].shift(-1)
-        df['duration'] = (df['next_timestamp'] - df['timestamp']).fillna(pd.Timedelta(seconds=0))
+        time_spent = self._time_spent(column)
+        self.time_spent = time_spent
+        return time_spent
+
+    @cached_query("time_spent")
+    def _time_spent(self, column: str) -> pd.DataFrame:
+        ts = self.data['timestamp']
+        duration = (ts.shift(-1) - ts).fillna(pd.Timedelta(seconds=0)).rename('duration')
         
-        # Grupowanie po procesach
-        time_spent = df.groupby(column)['duration'].sum().reset_index()
+        # Grupowanie po procesach (widoki kolumn, bez kopii całej ramki)
+        time_spent = duration.groupby(self.data[column], observed=True).sum().reset_index()
         time_spent['minutes'] = time_spent['duration'].dt.total_seconds() / 60
-        
-        self.time_spent = time_spent
         return time_spent
     
     def plot_time_spent(self, output_html: str = None):
@@ -54,16 +70,26 @@ class ProcessAnalyzer:
             print(f"Wykres zapisano do pliku: {output_html}")
         return fig
     
-    def plot_process_network(self, output_html: str = None, column: str = 'process'):
-        """Tworzy interaktywny wykres sieci przejść między procesami."""
-        df = self.data.copy()
-        df['next_process'] = df[column].shift(-1)
+    @cached_query("process_transitions")
+    def process_transitions(self, column: str = 'process') -> pd.DataFrame:
+        """Liczba przejść między kolejnymi wartościami kolumny (bez powtórzeń z rzędu)."""
+        current = self.data[column]
+        nxt = current.shift(-1).rename('next_process')
         
         # usuwamy powtarzające się procesy z rzędu (brak "przejścia")
-        df = df[df[column] != df['next_process']]
+        mask = current != nxt
         
         # liczba przejść między procesami
-        transitions = df.groupby([column, 'next_process']).size().reset_index(name='count')
+        return (
+            pd.DataFrame({column: current[mask], 'next_process': nxt[mask]})
+            .groupby([column, 'next_process'], observed=True)
+            .size()
+            .reset_index(name='count')
+        )
+
+    def plot_process_network(self, output_html: str = None, column: str = 'process'):
+        """Tworzy interaktywny wykres sieci przejść między procesami."""
+        transitions = self.process_transitions(column)
         
         # budowa grafu NetworkX
         G = nx.DiGraph()
@@ -0,0 +1,144 @@
+"""
+Query-result cache for the analyzers.
+
+Results are keyed by (query, source file, parameters, data watermark).
+The watermark is (row count, newest ts_ms) of the whole stream, or of one
+local-day partition when the query is per day, so:
+ - new rows in a stream change the key of every all-time query on it,
+ - a query for a past day keeps its key (and stays cached) because rows
+   are only appended for today.
+
+Stale entries are never looked up again and fall out through LRU eviction,
+bounded by a memory budget (estimated with DataFrame.memory_usage).
+Cached values are shared between callers and must not be mutated in place.
+"""
+
+import functools
+import inspect
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from Collector.timestamps import day_bounds_ms
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024  # 64 MB
+
+
+def estimate_size(value) -> int:
+    """Approximate memory footprint of a cached value in bytes."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    return sys.getsizeof(value)
+
+
+def frame_watermark(df: pd.DataFrame, day=None, ts_col: str = "ts_ms"):
+    """(row count, newest ts_ms) of the frame or of one local day (df sorted by ts_col)."""
+    ts = df[ts_col].to_numpy()
+    if day is None:
+        return (len(ts), int(ts[-1]) if len(ts) else None)
+    start, end = day_bounds_ms(day)
+    lo, hi = np.searchsorted(ts, [start, end])
+    return (int(hi - lo), int(ts[hi - 1]) if hi > lo else None)
+
+
+class QueryCache:
+    """Thread-safe LRU cache with a memory budget."""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Returns (hit, value)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[0]
+
+    def put(self, key, value):
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return  # za duże, żeby trzymać w cache
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+QUERY_CACHE = QueryCache()
+
+
+def cached_query(name: str, partition_arg: str = None, cache: QueryCache = None):
+    """
+    Decorator for analyzer methods. The analyzer must expose `source`
+    (stream id, e.g. CSV path) and `data` sorted by 'ts_ms'.
+
+    Args:
+        name (str): Query name (part of the key)
+        partition_arg (str, optional): Argument holding a day; when set and not
+            None, only that day's partition is used for the watermark
+        cache (QueryCache, optional): Defaults to the shared QUERY_CACHE
+    """
+    def decorator(func):
+        sig = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            bound = sig.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            params = tuple((k, v) for k, v in bound.arguments.items() if k != "self")
+            day = bound.arguments.get(partition_arg) if partition_arg else None
+            key = (name, self.source, params, frame_watermark(self.data, day))
+
+            store = cache if cache is not None else QUERY_CACHE
+            hit, value = store.get(key)
+            if hit:
+                return value
+            value = func(self, *args, **kwargs)
+            store.put(key, value)
+            return value
+
+        return wrapper
+    return decorator
@@ -0,0 +1,82 @@
+"""
+Sparse transition matrices with a bounded top-N + "other" projection.
+
+Transitions are kept as a square CSR matrix over one label space
+(rows = 'to', columns = 'from'), so memory grows with the number of
+distinct transitions, not with labels². Heatmaps call `top_n()` to keep the
+N labels with the largest mass (in + out transitions) and fold the rest into
+"other"; only that bounded matrix is densified by `to_dense()` at render time.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+OTHER_LABEL = "other"
+
+
+class TransitionMatrix:
+    """Square sparse matrix of transition counts: matrix[to, from]."""
+
+    def __init__(self, labels, matrix):
+        self.labels = pd.Index(labels)
+        self.matrix = sparse.csr_matrix(matrix)
+
+    @classmethod
+    def from_counts(cls, transitions: pd.DataFrame) -> "TransitionMatrix":
+        """From a ['from', 'to', 'count'] frame (count_transitions output)."""
+        codes, labels = pd.factorize(pd.concat([transitions["from"], transitions["to"]], ignore_index=True))
+        n_edges = len(transitions)
+        src, dst = codes[:n_edges], codes[n_edges:]
+        counts = transitions["count"].to_numpy()
+        size = len(labels)
+        matrix = sparse.coo_matrix((counts, (dst, src)), shape=(size, size))
+        return cls(labels, matrix)
+
+    @classmethod
+    def from_sequence(cls, values: pd.Series, drop_repeats: bool = True) -> "TransitionMatrix":
+        """Counts transitions between consecutive values of a sequence."""
+        values = pd.Series(values).dropna()
+        codes, labels = pd.factorize(values)
+        src, dst = codes[:-1], codes[1:]
+        if drop_repeats:
+            keep = src != dst
+            src, dst = src[keep], dst[keep]
+        size = len(labels)
+        matrix = sparse.coo_matrix((np.ones(len(src), dtype=np.int64), (dst, src)), shape=(size, size))
+        return cls(labels, matrix)
+
+    @property
+    def nnz(self) -> int:
+        return self.matrix.nnz
+
+    def mass(self) -> np.ndarray:
+        """In + out transitions of every label."""
+        return np.asarray(self.matrix.sum(axis=0)).ravel() + np.asarray(self.matrix.sum(axis=1)).ravel()
+
+    def top_n(self, n: int, other_label: str = OTHER_LABEL) -> "TransitionMatrix":
+        """Keeps the `n` heaviest labels, folding all others into `other_label`."""
+        size = len(self.labels)
+        if size <= n:
+            return self
+        keep = np.argsort(-self.mass(), kind="stable")[:n]
+        mapping = np.full(size, n, dtype=np.int64)  # reszta -> "other"
+        mapping[keep] = np.arange(n)
+
+        coo = self.matrix.tocoo()
+        folded = sparse.coo_matrix(
+            (coo.data, (mapping[coo.row], mapping[coo.col])), shape=(n + 1, n + 1)
+        )  # duplikaty sumują się przy konwersji do CSR
+        labels = list(self.labels[keep]) + [other_label]
+        return TransitionMatrix(labels, folded)
+
+    def to_dense(self) -> pd.DataFrame:
+        """Dense frame (index 'to', columns 'from') without empty rows/columns."""
+        dense = self.matrix.toarray()
+        rows = dense.any(axis=1)
+        cols = dense.any(axis=0)
+        return pd.DataFrame(
+            dense[np.ix_(rows, cols)],
+            index=pd.Index(self.labels[rows], name="to"),
+            columns=pd.Index(self.labels[cols], name="from"),
+        )
@@ -4,13 +4,26 @@ from typing import Optional
 import plotly.express as px
 from datetime import date
 
+from Collector.timestamps import day_bounds_ms, load_timestamp_column
+from .query_cache import cached_query
+from .sparse_transitions import TransitionMatrix
+from .compact import compact_frame, format_footprint, memory_footprint
+
 class DomainTransitionAnalyzer:
     def __init__(self, csv_path: str):
         """Wczytuje dane i przygotowuje DataFrame."""
-        self.data = pd.read_csv(csv_path)
-        self.data['timestamp'] = pd.to_datetime(self.data['timestamp'], errors='coerce')
-        self.data = self.data.dropna(subset=['timestamp'])
-        self.data = self.data.sort_values('timestamp').reset_index(drop=True)
+        self.source = str(csv_path)
+        # timestamp -> lokalny czas (tz-aware), ts_ms -> int64 epoch ms
+        data = pd.read_csv(csv_path, dtype={"eventType": "category", "domain": "category"})
+        data = compact_frame(load_timestamp_column(data), categories=["eventType", "domain"], float32=["seconds"])
+        self.data = data.sort_values('ts_ms', kind='stable').reset_index(drop=True)
+
+    def memory_footprint(self) -> dict:
+        """Zużycie pamięci przez dane (bajty na kolumnę i łącznie)."""
+        return memory_footprint(self.data)
+
+    def __repr__(self):
+        return f"<DomainTransitionAnalyzer {format_footprint(self.source, self.data)}>"
 
     @staticmethod
     def count_transitions(
@@ -22,13 +35,13 @@ class DomainTransitionAnalyzer:
         Liczy przejścia między kolejnymi rekordami w DataFrame.
         Zwraca DataFrame z kolumnami ['from', 'to', 'count'].
         """
-        df_copy = df.copy()
-        df_copy["prev"] = df_copy[main_col].shift(1)
-        transitions = df_copy.dropna(subset=["prev"]).copy()
-        transitions = transitions[transitions[main_col] != transitions["prev"]]
+        current = df[main_col]
+        prev = current.shift(1)
+        mask = prev.notna() & (current != prev)
+        transitions = pd.DataFrame({"prev": prev[mask], main_col: current[mask]})
 
         transition_counts = (
-            transitions.groupby(["prev", main_col])
+            transitions.groupby(["prev", main_col], observed=True)
             .size()
             .reset_index(name="count")
             .rename(columns={"prev": "from", main_col: "to"})
@@ -41,39 +54,48 @@ class DomainTransitionAnalyzer:
 
         return transition_counts
 
+    @cached_query("transitions", partition_arg="day")
+    def transitions_for(self, main_col: str = "domain", day=None) -> Optional[pd.DataFrame]:
+        """
+        Przejścia 'from -> to' dla całego okresu albo jednego (lokalnego) dnia.
+        Zwraca None, jeśli w zakresie nie ma żadnych danych.
+        """
+        mask = self.data[main_col].notna()
+        if day is not None:
+            # dzień lokalny jako zakres epoch ms
+            start, end = day_bounds_ms(day)
+            mask &= self.data["ts_ms"].between(start, end - 1)
+        df = self.data.loc[mask, [main_col]]
+        if df.empty:
+            return None
+        return self.count_transitions(df, main_col)
+
     def plot_heatmap(
         self,
         main_col: str = "domain",
         day = None,
-        save_dir: str = "plots"
+        save_dir: str = "plots",
+        max_labels: int = 30
     ):
         """
         Tworzy interaktywną heatmapę przejść 'from -> to'.
         Jeśli `day` jest podany, filtruje dane tylko dla tego dnia.
         W przeciwnym razie używa wszystkich danych.
+        Pokazuje `max_labels` domen o największej liczbie przejść, resztę jako "other".
         """
-        df = self.data.copy()
-        df = df.dropna(subset=[main_col, "timestamp"])
-        df["day"] = df["timestamp"].dt.date
-
         # wybór zakresu danych
-        if day is not None:
-            df = df[df["day"] == day]
-            label = f"dnia {day}"
-        else:
-            label = "całego okresu"
+        label = f"dnia {day}" if day is not None else "całego okresu"
 
-        if df.empty:
+        transitions = self.transitions_for(main_col, day)
+        if transitions is None:
             print(f"⚠️ Brak danych do narysowania heatmapy dla {label}.")
             return None
-
-        transitions = self.count_transitions(df, main_col)
         if transitions.empty:
             print(f"⚠️ Brak przejść do narysowania dla {label}.")
             return None
 
-        # pivot na macierz przejść
-        matrix = transitions.pivot(index="to", columns="from", values="count").fillna(0)
+        # macierz rzadka -> top-N + "other" -> gęsta tylko do rysowania
+        matrix = TransitionMatrix.from_counts(transitions).top_n(max_labels).to_dense()
 
         # Plotly heatmap
         fig = px.imshow(
@@ -102,27 +124,18 @@ class DomainTransitionAnalyzer:
         return fig
     
 
-    def plot_total_time_barplot(
-        self,
-        main_col: str = "domain",
-        save_dir: str = "plots",
-        top_n: int = 12
-    ):
-        """
-        Tworzy interaktywny barplot pokazujący łączny czas spędzony na różnych domenach.
-        Wybiera top-N domen o największym czasie (domyślnie 12).
-        """
-        df = self.data.copy()
-
-        if "seconds" not in df.columns:
+    @cached_query("total_time")
+    def total_time(self, main_col: str = "domain", top_n: int = 12) -> pd.DataFrame:
+        """Top-N wartości `main_col` według łącznego czasu (sekundy i minuty)."""
+        if "seconds" not in self.data.columns:
             raise ValueError("Brak kolumny 'seconds' w danych!")
 
-        df = df.dropna(subset=[main_col, "seconds"])
-        df["seconds"] = pd.to_numeric(df["seconds"], errors="coerce").fillna(0)
+        mask = self.data[main_col].notna() & self.data["seconds"].notna()
+        seconds = self.data.loc[mask, "seconds"].astype("float64")
 
         # sumowanie czasu
         total_time = (
-            df.groupby(main_col)["seconds"]
+            seconds.groupby(self.data.loc[mask, main_col], observed=True)
             .sum()
             .reset_index()
             .sort_values("seconds", ascending=False)
@@ -131,6 +144,19 @@ class DomainTransitionAnalyzer:
 
         # konwersja sekund -> minut
         total_time["minutes"] = total_time["seconds"] / 60
+        return total_time
+
+    def plot_total_time_barplot(
+        self,
+        main_col: str = "domain",
+        save_dir: str = "plots",
+        top_n: int = 12
+    ):
+        """
+        Tworzy interaktywny barplot pokazujący łączny czas spędzony na różnych domenach.
+        Wybiera top-N domen o największym czasie (domyślnie 12).
+        """
+        total_time = self.total_time(main_col, top_n)
 
         fig = px.bar(
             total_time,
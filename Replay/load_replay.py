@@ -0,0 +1,316 @@
+"""
+Record-and-replay load harness for the whole pipeline (no GUI needed).
+
+Replays recorded (or synthetic) activity at a chosen speed:
+ - windows.csv / events.csv / clipboard.csv rows go through the collector's
+   logging functions (log_window_snapshot, log_event, log_clipboard), writing
+   into a separate output folder,
+ - data_html.csv rows are POSTed to a running `/log` endpoint
+   (APP.PY or Ingest.async_server) from `--concurrency` worker threads.
+
+Reported: sustained throughput, p50/p99 ingest latency, writer flush time and
+dashboard freshness lag (time until a marker event is visible to
+DomainTransitionAnalyzer reading the server's CSV).
+
+The /log server must write to its own CSV, not to the recorded one:
+
+    python -m Ingest.async_server --port 5001 --csv replay_out/data_html.csv
+
+Examples:
+    python -m Replay.load_replay --speed 100 --url http://127.0.0.1:5001/log --html-csv replay_out/data_html.csv
+    python -m Replay.load_replay --synthetic 50000 --speed 0 --concurrency 32 --url http://127.0.0.1:5001/log
+"""
+
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urlparse
+
+import numpy as np
+import pandas as pd
+
+from Collector import collector_to_csv
+from Collector.timestamps import now_epoch_ms, parse_timestamps
+
+
+# ---------- Źródła zdarzeń ----------
+
+def _plain(value):
+    """CSV cell as the collector would log it: NaN -> None, 5068.0 -> 5068, numpy -> Python."""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float):
+        if value != value:
+            return None
+        if value.is_integer():
+            return int(value)
+    return value
+
+
+def load_recorded(data_dir: str) -> pd.DataFrame:
+    """
+    Merges recorded CSVs into one timeline with columns
+    ['ts_ms', 'kind', 'payload'] sorted by time.
+    """
+    data_dir = Path(data_dir)
+    frames = []
+
+    def read(name, kind, to_payload):
+        path = data_dir / name
+        if not path.exists():
+            return
+        df = pd.read_csv(path, on_bad_lines="skip")
+        if df.empty:
+            return
+        df["ts_ms"] = parse_timestamps(df["timestamp"])
+        df = df.dropna(subset=["ts_ms"])
+        frames.append(pd.DataFrame({
+            "ts_ms": df["ts_ms"].astype("int64"),
+            "kind": kind,
+            "payload": [to_payload(r._make(map(_plain, r))) for r in df.itertuples(index=False)],
+        }))
+
+    read("windows.csv", "window", lambda r: (r.title, r.pid, r.process))
+    read("events.csv", "event", lambda r: (r.event_type, r.window_title, r.pid, r.process))
+    read("clipboard.csv", "clipboard", lambda r: (str(r.content), r.window_title, r.pid, r.process))
+    read("data_html.csv", "log", lambda r: {
+        "eventType": r.eventType, "domain": r.domain, "seconds": r.seconds, "ts": r.timestamp,
+    })
+
+    if not frames:
+        return pd.DataFrame(columns=["ts_ms", "kind", "payload"])
+    return pd.concat(frames, ignore_index=True).sort_values("ts_ms", kind="stable").reset_index(drop=True)
+
+
+def synthetic(n_events: int, seed: int = 42, rate_per_s: float = 5.0) -> pd.DataFrame:
+    """Random workload: browser /log events mixed with window switches and copy/paste."""
+    rng = random.Random(seed)
+    processes = ["Code.exe", "opera.exe", "teams.exe", "excel.exe", "outlook.exe", "WindowsTerminal.exe"]
+    domains = [f"site{i}.example.com" for i in range(50)]
+    start = now_epoch_ms()
+    rows = []
+    ts = start
+    for _ in range(n_events):
+        ts += int(rng.expovariate(rate_per_s) * 1000)
+        roll = rng.random()
+        if roll < 0.6:
+            payload = {"eventType": "time_spent", "domain": rng.choice(domains),
+                       "seconds": rng.randint(1, 300), "ts": ts}
+            rows.append((ts, "log", payload))
+        elif roll < 0.9:
+            proc = rng.choice(processes)
+            rows.append((ts, "window", (f"{proc} - window {rng.randint(1, 20)}", rng.randint(100, 9999), proc)))
+        else:
+            proc = rng.choice(processes)
+            kind = rng.choice(["copy", "paste"])
+            rows.append((ts, "event", (kind, f"{proc} - window", rng.randint(100, 9999), proc)))
+    return pd.DataFrame(rows, columns=["ts_ms", "kind", "payload"])
+
+
+# ---------- Ujścia ----------
+
+class HttpLogSink:
+    """POSTs JSON to /log over keep-alive connections (one per worker thread)."""
+
+    def __init__(self, url: str, timeout: float = 10):
+        parsed = urlparse(url)
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self.path = parsed.path or "/log"
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        return conn
+
+    def send(self, payload: dict) -> int:
+        body = json.dumps(payload, default=str)
+        headers = {"Content-Type": "application/json"}
+        for attempt in range(2):
+            conn = self._conn()
+            try:
+                conn.request("POST", self.path, body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                return response.status
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                self._local.conn = None
+                if attempt:
+                    raise
+        return 0
+
+
+def collector_dispatch(kind: str, payload):
+    if kind == "window":
+        collector_to_csv.log_window_snapshot(*payload)
+    elif kind == "event":
+        event_type, title, pid, process = payload
+        collector_to_csv.log_event(event_type, title, pid, process)
+    elif kind == "clipboard":
+        collector_to_csv.log_clipboard(*payload)
+
+
+# ---------- Replay ----------
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.statuses = {}
+        self.errors = 0
+
+    def record(self, kind: str, seconds: float, status=None):
+        with self.lock:
+            self.latencies.setdefault(kind, []).append(seconds)
+            if status is not None:
+                self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def error(self):
+        with self.lock:
+            self.errors += 1
+
+
+def percentile_ms(values, q):
+    return round(float(np.percentile(np.asarray(values), q) * 1000), 3) if values else None
+
+
+def replay(timeline: pd.DataFrame, speed: float, concurrency: int, http_sink=None, send_logs=True):
+    """
+    Emits events keeping the recorded gaps divided by `speed`
+    (speed <= 0: as fast as possible). Returns (Stats, elapsed seconds).
+    """
+    stats = Stats()
+    if timeline.empty:
+        return stats, 0.0
+    pool = ThreadPoolExecutor(max_workers=concurrency)
+
+    def do_log(payload, t0):
+        # t0 = moment zlecenia, więc kolejka w puli też wlicza się do opóźnienia
+        try:
+            status = http_sink.send(payload)
+            stats.record("log", time.perf_counter() - t0, status)
+        except Exception:
+            stats.error()
+
+    ts = timeline["ts_ms"].to_numpy()
+    base_ts = ts[0]
+    started = time.perf_counter()
+    for i, (kind, payload) in enumerate(zip(timeline["kind"], timeline["payload"])):
+        if speed > 0:
+            due = started + (ts[i] - base_ts) / 1000 / speed
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        if kind == "log":
+            if send_logs and http_sink is not None:
+                pool.submit(do_log, payload, time.perf_counter())
+        else:
+            t0 = time.perf_counter()
+            collector_dispatch(kind, payload)
+            stats.record(kind, time.perf_counter() - t0)
+    pool.shutdown(wait=True)
+    return stats, time.perf_counter() - started
+
+
+def measure_freshness(http_sink, html_csv: str, timeout: float = 30.0, poll: float = 0.05):
+    """
+    Sends a marker event and waits until DomainTransitionAnalyzer loading
+    `html_csv` sees it. Returns lag in seconds (None on timeout or when the
+    marker could not be sent).
+    """
+    from Process_analyse.web_analys import DomainTransitionAnalyzer
+
+    marker = f"replay-marker-{uuid.uuid4().hex[:8]}"
+    sent = time.perf_counter()
+    try:
+        status = http_sink.send({"eventType": "time_spent", "domain": marker, "seconds": 0, "ts": now_epoch_ms()})
+    except (http.client.HTTPException, OSError) as e:
+        print(f"[FRESHNESS] Marker not sent: {e}")
+        return None
+    if not 200 <= status < 300:
+        print(f"[FRESHNESS] Marker rejected: HTTP {status}")
+        return None
+    while time.perf_counter() - sent < timeout:
+        try:
+            analyzer = DomainTransitionAnalyzer(html_csv)
+            if (analyzer.data["domain"] == marker).any():
+                return time.perf_counter() - sent
+        except Exception:
+            pass
+        time.sleep(poll)
+    return None
+
+
+def build_report(stats: Stats, elapsed: float, flush_s: float, freshness_s) -> dict:
+    total = sum(len(v) for v in stats.latencies.values())
+    report = {
+        "events": total,
+        "errors": stats.errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_eps": round(total / elapsed, 1) if elapsed else None,
+        "writer_flush_ms": round(flush_s * 1000, 2),
+        "freshness_lag_ms": round(freshness_s * 1000, 1) if freshness_s is not None else None,
+        "http_status": stats.statuses,
+        "latency_ms": {
+            kind: {"p50": percentile_ms(v, 50), "p99": percentile_ms(v, 99), "n": len(v)}
+            for kind, v in stats.latencies.items()
+        },
+    }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded activity through collector and /log")
+    parser.add_argument("--source", default="data", help="folder with recorded CSVs")
+    parser.add_argument("--synthetic", type=int, default=0, help="generate N synthetic events instead")
+    parser.add_argument("--speed", type=float, default=60.0, help="speed multiple (0 = as fast as possible)")
+    parser.add_argument("--concurrency", type=int, default=8, help="parallel /log senders")
+    parser.add_argument("--url", default=None, help="/log endpoint, e.g. http://127.0.0.1:5000/log")
+    parser.add_argument("--html-csv", default=None, help="CSV written by the /log server (freshness check)")
+    parser.add_argument("--out-dir", default="replay_out", help="collector output folder")
+    parser.add_argument("--json", default=None, help="write the report to this file")
+    args = parser.parse_args()
+    if args.url and args.html_csv and not args.synthetic:
+        source_html = Path(args.source) / "data_html.csv"
+        if source_html.exists() and Path(args.html_csv).resolve() == source_html.resolve():
+            # serwer dopisywałby odtwarzane wiersze (i markery) do nagrania, które czytamy
+            parser.error(f"--html-csv is the recorded {source_html}; start the server with --csv <other file>")
+
+    timeline = synthetic(args.synthetic) if args.synthetic else load_recorded(args.source)
+    print(f"Zdarzenia do odtworzenia: {len(timeline)} ({timeline['kind'].value_counts().to_dict()})")
+
+    collector_to_csv.configure_data_dir(args.out_dir)
+    collector_to_csv.ensure_csv_files()
+    collector_to_csv.csv_writer.start()
+
+    http_sink = HttpLogSink(args.url) if args.url else None
+    stats, elapsed = replay(timeline, args.speed, args.concurrency, http_sink)
+
+    t0 = time.perf_counter()
+    collector_to_csv.csv_writer.flush()
+    flush_s = time.perf_counter() - t0
+
+    freshness = None
+    if http_sink is not None and args.html_csv:
+        freshness = measure_freshness(http_sink, args.html_csv)
+    collector_to_csv.csv_writer.close()
+
+    report = build_report(stats, elapsed, flush_s, freshness)
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
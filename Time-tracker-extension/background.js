@@ -1,11 +1,276 @@
+// Śledzenie czasu w jednym miejscu (service worker), bez timerów w kartach.
+// Aktywny przedział = (karta, domena, start). Zamykamy go przy zmianie karty,
+// zmianie URL, utracie fokusu okna przeglądarki albo bezczynności użytkownika.
+// Zamknięte przedziały są scalane (ta sama domena bez przerwy) i wysyłane
+// partiami do lokalnego serwera; każdy ma id (wysyłane w /log), więc serwer
+// odrzuca powtórki i ponowienie nie dubluje czasu.
+
+const SERVER_URL = "http://127.0.0.1:5000/log";
+const IDLE_DETECTION_SECONDS = 60;
+const FLUSH_ALARM = "flush-intervals";
+const FLUSH_PERIOD_MINUTES = 0.5;
+const COALESCE_GAP_MS = 2000;      // przerwa, przy której łączymy przedziały
+// Brak ticku alarmu dłużej niż to = przeglądarka / system nie działał (zamknięcie,
+// crash, uśpienie); taki przedział kończymy na ostatnim ticku, nie na Date.now()
+const STALE_AFTER_MS = 3 * FLUSH_PERIOD_MINUTES * 60 * 1000;
+const MAX_LOGS = 1000;             // historia dla popupu
+
 let logs = [];
 let ports = [];
+let state = null;   // { current: {tabId, domain, url, start, lastSeen} | null, pending: [], sentIds: [] }
+let statePromise = null;
+let chain = Promise.resolve();
+let flushing = false;
+
+// ---------- Stan (service worker może zostać uśpiony) ----------
+
+function loadState() {
+    // jedno wczytanie na życie workera, równoległe wywołania dostają ten sam stan
+    if (!statePromise) {
+        statePromise = chrome.storage.local.get(["trackerState", "logs"]).then((res) => {
+            state = res.trackerState || { current: null, pending: [], sentIds: [] };
+            logs = res.logs || [];
+            return state;
+        });
+    }
+    return statePromise;
+}
+
+// Handlery zmieniające stan wykonujemy po kolei (await w środku nie przeplata zmian)
+function serial(fn) {
+    return (...args) => {
+        const run = chain.then(() => fn(...args));
+        chain = run.catch(err => console.log("Błąd obsługi zdarzenia:", err));
+        return run;
+    };
+}
+
+function saveState() {
+    return chrome.storage.local.set({ trackerState: state });
+}
 
 function saveLogs() {
-    chrome.storage.local.set({ logs });
+    return chrome.storage.local.set({ logs });
+}
+
+function domainOf(url) {
+    try {
+        const u = new URL(url);
+        return (u.protocol === "http:" || u.protocol === "https:") ? u.hostname : null;
+    } catch (e) {
+        return null;
+    }
+}
+
+// ---------- Akumulator aktywnego przedziału ----------
+
+function closeCurrent(now) {
+    const cur = state.current;
+    state.current = null;
+    if (!cur) return;
+    const lastSeen = cur.lastSeen || cur.start;
+    if (now - lastSeen > STALE_AFTER_MS) now = lastSeen;   // przestój nie jest czasem na stronie
+    if (now <= cur.start) return;
+
+    const last = state.pending[state.pending.length - 1];
+    if (last && last.domain === cur.domain && cur.start - last.end <= COALESCE_GAP_MS) {
+        last.end = now;   // ta sama domena bez przerwy -> jeden przedział
+        return;
+    }
+    state.pending.push({
+        id: `${cur.start}-${cur.domain}`,
+        domain: cur.domain,
+        url: cur.url,
+        start: cur.start,
+        end: now
+    });
+}
+
+async function switchTo(tab) {
+    await loadState();
+    const now = Date.now();
+    const domain = tab ? domainOf(tab.url || "") : null;
+    const cur = state.current;
+
+    if (cur && tab && cur.tabId === tab.id && cur.domain === domain && now - cur.lastSeen <= STALE_AFTER_MS) {
+        cur.lastSeen = now;   // bez zmian (zapisze się przy najbliższym ticku)
+        return;
+    }
+
+    closeCurrent(now);
+    if (domain) {
+        state.current = { tabId: tab.id, domain, url: tab.url, start: now, lastSeen: now };
+    }
+    await saveState();
+}
+
+async function stopTracking() {
+    await loadState();
+    closeCurrent(Date.now());
+    await saveState();
+}
+
+async function activeTabOfFocusedWindow() {
+    const win = await chrome.windows.getLastFocused({ populate: false }).catch(() => null);
+    if (!win || !win.focused) return null;
+    const [tab] = await chrome.tabs.query({ active: true, windowId: win.id });
+    return tab || null;
+}
+
+async function canTrack(tab) {
+    // liczymy tylko aktywną kartę okna z fokusem, gdy użytkownik nie jest bezczynny
+    if (!tab || !tab.active) return false;
+    const win = await chrome.windows.get(tab.windowId).catch(() => null);
+    if (!win || !win.focused) return false;
+    const idleState = await chrome.idle.queryState(IDLE_DETECTION_SECONDS);
+    return idleState === "active";
+}
+
+async function resumeTracking() {
+    const idleState = await chrome.idle.queryState(IDLE_DETECTION_SECONDS);
+    if (idleState !== "active") return stopTracking();
+    return switchTo(await activeTabOfFocusedWindow());
 }
 
-// Obsługa popup
+// ---------- Wysyłka ----------
+
+// Gotowe przedziały zdejmujemy z kolejki przed pierwszym await na sieć;
+// to, co domknie się w trakcie wysyłki, trafia do state.pending i czeka na
+// następną wysyłkę, a nieudane wracają na początek kolejki.
+const takeReady = serial(async () => {
+    await loadState();
+    const ready = state.pending.filter(interval =>
+        !state.sentIds.includes(interval.id) && interval.end - interval.start >= 1000);
+    state.pending = [];
+    await saveState();
+    return ready;
+});
+
+const finishFlush = serial(async (sent, failed) => {
+    for (const { interval, logData } of sent) {
+        state.sentIds.push(interval.id);
+        const entry = {
+            eventType: "time_spent",
+            domain: interval.domain,
+            url: interval.url,
+            ts: logData.ts,
+            data: logData
+        };
+        logs.push(entry);
+        ports.forEach(port => port.postMessage(entry));
+    }
+    state.pending = failed.concat(state.pending);
+    state.sentIds = state.sentIds.slice(-200);
+    logs = logs.slice(-MAX_LOGS);
+    await Promise.all([saveState(), saveLogs()]);
+});
+
+async function flushPending() {
+    if (flushing) return;
+    flushing = true;
+    try {
+        const ready = await takeReady();
+        const sent = [];
+        const failed = [];
+        for (const interval of ready) {
+            const logData = {
+                id: interval.id,   // serwer odrzuca powtórki (np. po zgubionej odpowiedzi)
+                eventType: "time_spent",
+                domain: interval.domain,
+                seconds: Math.floor((interval.end - interval.start) / 1000),
+                ts: new Date(interval.end).toISOString()
+            };
+            try {
+                const res = await fetch(SERVER_URL, {
+                    method: "POST",
+                    headers: { "Content-Type": "application/json" },
+                    body: JSON.stringify(logData)
+                });
+                if (!res.ok) throw new Error(`HTTP ${res.status}`);
+                sent.push({ interval, logData });
+            } catch (err) {
+                console.log("Błąd wysyłki logu:", err);
+                failed.push(interval);
+            }
+        }
+        await finishFlush(sent, failed);
+    } finally {
+        flushing = false;
+    }
+}
+
+// ---------- Zdarzenia przeglądarki ----------
+
+chrome.tabs.onActivated.addListener(serial(async ({ tabId }) => {
+    const tab = await chrome.tabs.get(tabId).catch(() => null);
+    if (!(await canTrack(tab))) return;   // np. zmiana karty w oknie w tle
+    await switchTo(tab);
+}));
+
+chrome.tabs.onUpdated.addListener(serial(async (tabId, changeInfo, tab) => {
+    if (!changeInfo.url || !tab.active) return;
+    await loadState();
+    if (state.current && state.current.tabId !== tabId) return;
+    if (!state.current && !(await canTrack(tab))) return;   // przekierowanie w tle nie startuje licznika
+    await switchTo(tab);
+}));
+
+chrome.tabs.onRemoved.addListener(serial(async (tabId) => {
+    await loadState();
+    if (state.current && state.current.tabId === tabId) await stopTracking();
+}));
+
+chrome.windows.onFocusChanged.addListener(serial(async (windowId) => {
+    if (windowId === chrome.windows.WINDOW_ID_NONE) {
+        await stopTracking();   // przeglądarka straciła fokus
+        return;
+    }
+    const [tab] = await chrome.tabs.query({ active: true, windowId });
+    await switchTo(tab || null);
+}));
+
+chrome.idle.setDetectionInterval(IDLE_DETECTION_SECONDS);
+chrome.idle.onStateChanged.addListener(serial(async (newState) => {
+    if (newState === "active") await resumeTracking();
+    else await stopTracking();
+}));
+
+chrome.alarms.create(FLUSH_ALARM, { periodInMinutes: FLUSH_PERIOD_MINUTES });
+const splitCurrent = serial(async () => {
+    await loadState();
+    // przedział aktywnej karty też zamykamy okresowo, żeby dane płynęły na bieżąco
+    const cur = state.current;
+    if (cur) {
+        const now = Date.now();
+        closeCurrent(now);   // po długiej przerwie między tickami: tylko do ostatniego ticku
+        state.current = { ...cur, start: now, lastSeen: now };
+        await saveState();
+    }
+});
+
+chrome.alarms.onAlarm.addListener(async (alarm) => {
+    if (alarm.name !== FLUSH_ALARM) return;
+    await splitCurrent();
+    await flushPending();   // poza kolejką handlerów: sieć nie blokuje zdarzeń kart
+});
+
+// Przedział zapisany przed zamknięciem / crashem przeglądarki: liczymy go tylko
+// do ostatniego ticku, czas wyłączenia nie trafia do żadnej domeny
+async function dropStaleCurrent() {
+    await loadState();
+    const cur = state.current;
+    if (cur) {
+        closeCurrent(cur.lastSeen || cur.start);
+        await saveState();
+    }
+    await resumeTracking();
+}
+
+chrome.runtime.onStartup.addListener(serial(dropStaleCurrent));
+chrome.runtime.onInstalled.addListener(serial(dropStaleCurrent));
+
+// ---------- Popup ----------
+
 chrome.runtime.onConnect.addListener((port) => {
     if (port.name === "popup") {
         ports.push(port);
@@ -15,33 +280,18 @@ chrome.runtime.onConnect.addListener((port) => {
     }
 });
 
-// Odbieranie eventów z content_script
 chrome.runtime.onMessage.addListener((msg, sender, sendResponse) => {
-    if (msg.type === "event") {
-        const entry = {
-            eventType: msg.eventType,
-            domain: msg.data.domain || msg.domain,
-            url: msg.url,
-            ts: msg.ts,
-            data: msg.data
-        };
-
-        // Dodaj log tylko dla time_spent
-        if (entry.eventType === "time_spent") {
-            logs.push(entry);
-            saveLogs();
-            // Wyślij do popup
-            ports.forEach(port => port.postMessage(entry));
-        }
-    } else if (msg.type === "getLogs") {
+    if (msg.type === "getLogs") {
         chrome.storage.local.get(["logs"], (res) => {
             sendResponse({ logs: res.logs || [] });
         });
         return true; // async response
     } else if (msg.type === "resetLogs") {
-        logs = [];
-        saveLogs();
-        sendResponse({ ok: true });
+        serial(async () => {
+            await loadState();
+            logs = [];
+            await saveLogs();
+        })().then(() => sendResponse({ ok: true }));
         return true;
     }
 });
@@ -5,12 +5,14 @@ import seaborn as sns
 from typing import Optional
 from pathlib import Path
 
+from Collector.timestamps import load_timestamp_column
+from Process_analyse.sparse_transitions import TransitionMatrix
+
 def load_and_sort_logs(path: str, ts_col: str = "timestamp") -> pd.DataFrame:
     """Wczytuje CSV i sortuje po kolumnie timestamp rosnąco."""
     df = pd.read_csv(path)
-    df[ts_col] = pd.to_datetime(df[ts_col], errors="coerce")
-    df = df.dropna(subset=[ts_col])
-    df = df.sort_values(by=ts_col).reset_index(drop=True)
+    df = load_timestamp_column(df, ts_col)
+    df = df.sort_values(by="ts_ms").reset_index(drop=True)
     return df
 
 
@@ -51,18 +53,17 @@ def count_transitions(
 
 def plot_topN_heatmap(transitions: pd.DataFrame, top_n: int = 10):
     """
-    Rysuje heatmapę dla najczęstszych przejść 'from' -> 'to'.
+    Rysuje heatmapę przejść 'from' -> 'to' dla najczęściej występujących tytułów.
 
     Args:
         transitions (pd.DataFrame): Dane z kolumnami ['from', 'to', 'count']
-        top_n (int): Ile najczęstszych przejść uwzględnić
+        top_n (int): Ile tytułów (wierszy/kolumn) pokazać; reszta trafia do "other"
     """
-    top = transitions.head(top_n)
-    matrix = top.pivot(index="to", columns="from", values="count").fillna(0)
+    matrix = TransitionMatrix.from_counts(transitions).top_n(top_n).to_dense()
 
     plt.figure(figsize=(10, 7))
     sns.heatmap(matrix, annot=True, fmt=".0f", cmap="Blues", cbar=True)
-    plt.title(f"Heatmapa {top_n} najczęstszych przejść (from → to)")
+    plt.title(f"Heatmapa przejść — top {top_n} tytułów + other (from → to)")
     plt.xlabel("from")
     plt.ylabel("to")
     plt.xticks(rotation=45, ha="right")
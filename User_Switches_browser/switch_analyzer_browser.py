@@ -1,28 +1,40 @@
 # User_Switch_html/analyzer.py
 
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 from typing import Optional
 from pathlib import Path
 
+from Collector.timestamps import load_timestamp_column, local_dates, local_day, parse_timestamps
+from Process_analyse.sparse_transitions import TransitionMatrix
+
 
 def load_and_sort_logs(path: str, ts_col: str = "timestamp") -> pd.DataFrame:
     """Loads CSV and sorts by timestamp column ascending."""
 
-    # Read only specific columns we need
+    # Columns by position: the file may have either the extension header
+    # (eventType,domain,seconds,timestamp) or no header at all
     df = pd.read_csv(
         path,
-        usecols=["event", "domain", "time", "timestamp"],
+        header=None,
+        names=["event", "domain", "time", "timestamp"],
+        usecols=[0, 1, 2, 3],
         on_bad_lines='skip'  # Skip problematic lines
     )
+    df = df[df["event"] != "eventType"]
     
     if ts_col not in df.columns:
         raise ValueError(f"Missing timestamp column in file: {path}")
 
-    df[ts_col] = pd.to_datetime(df[ts_col], errors="coerce")
-    df = df.dropna(subset=[ts_col])
-    df = df.sort_values(by=ts_col).reset_index(drop=True)
+    df = load_timestamp_column(df, ts_col)
+    df = df.sort_values(by="ts_ms").reset_index(drop=True)
     
     print(f"Successfully loaded {len(df)} rows from {path}")
     return df
@@ -79,67 +91,115 @@ def count_transitions(
     return transition_counts
 
 
+MANIFEST_FILE = "manifest.json"
+SOURCE_KEY = "_source"   # wpis manifestu: rozmiar / mtime / offset pliku i zakresy bajtów dni
+HEATMAP_MAX_LABELS = 25  # więcej nie da się czytelnie opisać liczbami
+
+
+def _prepare_days(df: pd.DataFrame) -> pd.DataFrame:
+    """Adds the local 'day' (YYYY-MM-DD) column; parses timestamps only if needed."""
+    if "ts_ms" not in df.columns:
+        df = load_timestamp_column(df)
+    df = df.copy()
+    df["day"] = local_day(df["ts_ms"]).astype(str)
+    return df
+
+
+def _time_spent_rows(df: pd.DataFrame) -> pd.DataFrame:
+    df = df[df["event"] == "time_spent"].copy()
+    df["time"] = pd.to_numeric(df["time"], errors="coerce")
+    return df.dropna(subset=["time"])
+
+
+def _fingerprint(group: pd.DataFrame, cols) -> str:
+    """Cheap content hash of one day's rows (changes when rows are added/edited)."""
+    hashed = pd.util.hash_pandas_object(group[list(cols)], index=False)
+    return f"{len(group)}:{int(hashed.sum()) & 0xFFFFFFFFFFFFFFFF:x}"
+
+
+def _draw_heatmap(day: str, group: pd.DataFrame, main_col: str, save_dir: str):
+    """Heatmapa przejść dla jednego dnia. Zwraca ścieżkę pliku albo None."""
+    group_copy = group.copy()
+    group_copy["prev"] = group_copy[main_col].shift(1)
+    transitions = group_copy.dropna(subset=["prev"])
+    transitions = transitions[transitions[main_col] != transitions["prev"]]
+
+    transition_counts = (
+        transitions.groupby(["prev", main_col])
+        .size()
+        .reset_index(name="count")
+        .rename(columns={"prev": "from", main_col: "to"})
+    )
+
+    if transition_counts.empty:
+        print(f"Brak przejść do narysowania dla dnia {day}")
+        return None
+
+    matrix = TransitionMatrix.from_counts(transition_counts).top_n(HEATMAP_MAX_LABELS).to_dense()
+
+    plt.figure(figsize=(12, 8))
+    sns.heatmap(matrix, annot=True, fmt=".0f", cmap="Blues", cbar=True)
+    plt.title(f"Heatmapa przejść — {day}")
+    plt.xlabel("from")
+    plt.ylabel("to")
+    plt.xticks(rotation=45, ha="right")
+    plt.yticks(rotation=0)
+    plt.tight_layout()
+
+    output_file = Path(save_dir) / f"heatmapa_przejsc_{day}.png"
+    plt.savefig(output_file)
+    plt.close()
+
+    print(f"✅ Heatmapa zapisana dla dnia {day} -> {output_file}")
+    return output_file
+
+
+def _draw_time_spent(day: str, group: pd.DataFrame, top_n: int, save_dir: str):
+    """Top-N stron według czasu dla jednego dnia. Zwraca ścieżkę pliku."""
+    print(f"Dzień: {day}, liczba rekordów: {len(group)}")
+    summary = (
+        group.groupby("domain")["time"]
+        .sum()
+        .sort_values(ascending=False)
+        .head(top_n)
+        .reset_index()
+    )
+
+    plt.figure(figsize=(10, 6))
+    sns.barplot(x="time", y="domain", data=summary, palette="viridis")
+    plt.xlabel("Łączny czas spędzony (sekundy)")
+    plt.ylabel("Strona (domena)")
+    plt.title(f"Top {top_n} stron — {day}")
+    plt.tight_layout()
+
+    output_file = Path(save_dir) / f"time_spent_{day}.png"
+    plt.savefig(output_file)
+    plt.close()
+    return output_file
+
+
 def plot_heatmaps_per_day(df: pd.DataFrame, main_col: str, save_dir: str = "../plots"):
     """
     Tworzy heatmapy przejść 'from -> to' dla każdego dnia i zapisuje je jako pliki PNG.
     """
-    df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
-    df = df.dropna(subset=[main_col, "timestamp"])
-
-    # Grupowanie po dniu
-    df["day"] = df["timestamp"].dt.date
+    df = _prepare_days(df).dropna(subset=[main_col, "timestamp"])
 
     Path(save_dir).mkdir(parents=True, exist_ok=True)
 
     for day, group in df.groupby("day"):
-        group_copy = group.copy()
-        group_copy["prev"] = group_copy[main_col].shift(1)
-        transitions = group_copy.dropna(subset=["prev"])
-        transitions = transitions[transitions[main_col] != transitions["prev"]]
-
-        transition_counts = (
-            transitions.groupby(["prev", main_col])
-            .size()
-            .reset_index(name="count")
-            .rename(columns={"prev": "from", main_col: "to"})
-        )
-
-        if transition_counts.empty:
-            print(f"Brak przejść do narysowania dla dnia {day}")
-            continue
-
-        matrix = transition_counts.pivot(index="to", columns="from", values="count").fillna(0)
-
-        plt.figure(figsize=(12, 8))
-        sns.heatmap(matrix, annot=True, fmt=".0f", cmap="Blues", cbar=True)
-        plt.title(f"Heatmapa przejść — {day}")
-        plt.xlabel("from")
-        plt.ylabel("to")
-        plt.xticks(rotation=45, ha="right")
-        plt.yticks(rotation=0)
-        plt.tight_layout()
-
-        output_file = Path(save_dir) / f"heatmapa_przejsc_{day}.png"
-        plt.savefig(output_file)
-        plt.close()
-
-        print(f"✅ Heatmapa zapisana dla dnia {day} -> {output_file}")
-
-def plot_time_spent_histograms_per_day(csv_path: str, top_n: int = 10, save_dir: str = "../plots"):
+        _draw_heatmap(day, group, main_col, save_dir)
+
+def plot_time_spent_histograms_per_day(csv_path, top_n: int = 10, save_dir: str = "../plots"):
     """
     Tworzy osobne histogramy czasu spędzonego na stronach dla każdego dnia
-    (grupując po pierwszych 9 znakach timestamp)
+    (grupując po lokalnym dniu timestamp)
     i zapisuje je jako pliki PNG.
-    """
 
-    df = pd.read_csv(csv_path, header=None, names=["event", "domain", "time", "timestamp"])
-    df = df[df["event"] == "time_spent"].copy()
-
-    df["time"] = pd.to_numeric(df["time"], errors="coerce")
-    df = df.dropna(subset=["time", "timestamp"])
-
-    # Pobieramy tylko pierwsze 10 znaków timestamp (YYYY-MM-DD)
-    df["day"] = df["timestamp"].str[:10]
+    Args:
+        csv_path (str | pd.DataFrame): Ścieżka do CSV albo ramka z load_and_sort_logs
+    """
+    df = csv_path if isinstance(csv_path, pd.DataFrame) else load_and_sort_logs(csv_path)
+    df = _time_spent_rows(_prepare_days(df))
 
     # Debug: sprawdź, jakie "dni" wykryto
     print("Wykryte dni:", df["day"].unique())
@@ -148,37 +208,234 @@ def plot_time_spent_histograms_per_day(csv_path: str, top_n: int = 10, save_dir:
     results = []
 
     for day, group in df.groupby("day"):
-        print(f"Dzień: {day}, liczba rekordów: {len(group)}")
-        summary = (
-            group.groupby("domain")["time"]
-            .sum()
-            .sort_values(ascending=False)
-            .head(top_n)
-            .reset_index()
-        )
-
-        plt.figure(figsize=(10, 6))
-        sns.barplot(x="time", y="domain", data=summary, palette="viridis")
-        plt.xlabel("Łączny czas spędzony (sekundy)")
-        plt.ylabel("Strona (domena)")
-        plt.title(f"Top {top_n} stron — {day}")
-        plt.tight_layout()
-
-        output_file = Path(save_dir) / f"time_spent_{day}.png"
-        plt.savefig(output_file)
-        plt.close()
-
+        output_file = _draw_time_spent(day, group, top_n, save_dir)
         results.append((day, output_file))
 
     print(f"✅ Zapisano {len(results)} wykresów w folderze: {save_dir}")
     return results
 
 
+def _load_manifest(save_dir: str) -> dict:
+    try:
+        with open(Path(save_dir) / MANIFEST_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_manifest(save_dir: str, manifest: dict):
+    path = Path(save_dir) / MANIFEST_FILE
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def _source_state(csv_path: str) -> dict:
+    st = os.stat(csv_path)
+    return {"path": str(Path(csv_path).resolve()), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def _complete_offset(csv_path: str, size: int) -> int:
+    """Byte offset just after the last full line within the first `size` bytes."""
+    with open(csv_path, "rb") as f:
+        start = max(0, size - 64 * 1024)
+        f.seek(start)
+        chunk = f.read(size - start)
+    cut = chunk.rfind(b"\n")
+    return start + cut + 1 if cut != -1 else start
+
+
+def _read_range(csv_path: str, start: int, end: int) -> bytes:
+    with open(csv_path, "rb") as f:
+        f.seek(start)
+        return f.read(end - start)
+
+
+def _day_spans(data: bytes, base: int = 0):
+    """
+    Byte ranges {day: [[start, end], ...]} of the rows in `data` (complete
+    lines starting at file offset `base`), one range per run of rows of the
+    same local day. None if a row cannot be dated this way (e.g. quoted
+    commas) - the caller then falls back to reading the whole file.
+    """
+    lines = data.split(b"\n")
+    if lines and lines[-1] == b"":
+        lines.pop()
+    if not lines:
+        return {}
+    ends = base + np.cumsum([len(line) + 1 for line in lines])
+    starts = ends - np.array([len(line) + 1 for line in lines])
+    fields = [line.rstrip(b"\r").split(b",", 4) for line in lines]
+    stamps = pd.Series([f[3].decode("utf-8", "replace") if len(f) >= 4 else None for f in fields], dtype=object)
+    ms = parse_timestamps(stamps)
+    known = ms.notna().to_numpy()
+    # bez daty mogą być tylko nagłówki i puste linie (loader i tak je pomija)
+    ignorable = np.array([f[0] in (b"eventType", b"") for f in fields])
+    if not (known | ignorable).all():
+        return None
+    rows = np.flatnonzero(known)
+    if not len(rows):
+        return {}
+    days = local_dates(ms[known].astype("int64").to_numpy()).astype(str)
+    breaks = np.flatnonzero(days[1:] != days[:-1]) + 1
+    spans = {}
+    for first, last in zip(np.r_[0, breaks], np.r_[breaks, len(rows)] - 1):
+        spans.setdefault(days[first], []).append([int(starts[rows[first]]), int(ends[rows[last]])])
+    return spans
+
+
+def _merge_spans(spans: dict, more: dict) -> dict:
+    """Adds `more` (later in the file) to `spans`, joining touching ranges."""
+    merged = {day: [list(r) for r in ranges] for day, ranges in spans.items()}
+    for day, ranges in more.items():
+        target = merged.setdefault(day, [])
+        for start, end in ranges:
+            if target and target[-1][1] == start:
+                target[-1][1] = end
+            else:
+                target.append([start, end])
+    return merged
+
+
+def _load_day_rows(csv_path: str, spans: dict, days) -> pd.DataFrame:
+    """Rows of the given days only, read from their byte ranges (in file order)."""
+    ranges = sorted(r for day in days for r in spans.get(day, []))
+    with open(csv_path, "rb") as f:
+        chunks = []
+        for start, end in ranges:
+            f.seek(start)
+            chunks.append(f.read(end - start))
+    return load_and_sort_logs(io.BytesIO(b"".join(chunks)))
+
+
+def render_daily_reports(
+        csv_path: str,
+        main_col: Optional[str] = None,
+        top_n: int = 10,
+        save_dir: str = "../plots",
+        workers: Optional[int] = None,
+        force: bool = False
+) -> list:
+    """
+    Rysuje dzienne heatmapy i wykresy czasu tylko dla dni, których dane
+    zmieniły się od ostatniego uruchomienia (manifest.json w `save_dir`),
+    równolegle w puli procesów.
+
+    Manifest pamięta rozmiar, mtime i offset ostatnio przeczytanego pliku
+    oraz zakresy bajtów, w których leżą wiersze każdego dnia:
+     - plik bez zmian -> nic nie jest czytane,
+     - plik tylko dopisany -> czytany jest ogon od offsetu, żeby ustalić,
+       których dni dotyczą nowe wiersze; potem tylko zakresy tych dni
+       (dzień może mieć wiersze w dowolnym miejscu pliku) - haszowane
+       i rysowane są tylko te dni,
+     - plik skrócony / podmieniony, brak zakresów albo `force` -> cały plik
+       wczytany, wszystkie dni haszowane i porównywane z manifestem.
+
+    Args:
+        csv_path (str): Plik z logami rozszerzenia
+        main_col (str, optional): Kolumna przejść (domyślnie detect_main_column)
+        top_n (int): Ile stron na wykresie czasu
+        save_dir (str): Folder na PNG i manifest
+        workers (int, optional): Liczba procesów (domyślnie os.cpu_count())
+        force (bool): Rysuj wszystkie dni niezależnie od manifestu
+
+    Returns:
+        list: [(kind, day, output_file)] dla narysowanych wykresów
+    """
+    Path(save_dir).mkdir(parents=True, exist_ok=True)
+    manifest = {} if force else _load_manifest(save_dir)
+    previous = manifest.pop(SOURCE_KEY, None)
+    source = _source_state(csv_path)
+    main_col = main_col or (previous or {}).get("main_col")
+
+    def output_ok(key):
+        """Wpis manifestu z tymi samymi parametrami i istniejącym PNG."""
+        kind, day = key.split(":", 1)
+        pattern, params = {
+            "heatmap": ("heatmapa_przejsc_{day}.png", {"main_col": main_col}),
+            "time_spent": ("time_spent_{day}.png", {"top_n": top_n}),
+        }[kind]
+        entry = manifest.get(key, {})
+        same_params = all(entry.get(name) == value for name, value in params.items())
+        # dzień bez przejść -> brak pliku
+        return same_params and (entry.get("empty") or (Path(save_dir) / pattern.format(day=day)).exists())
+
+    # None = nie wiadomo, które dni się zmieniły -> cały plik, haszujemy wszystkie
+    touched = None
+    spans = None
+    end = _complete_offset(csv_path, source["size"])
+    if previous and main_col and previous["path"] == source["path"] and end >= previous["offset"]:
+        if previous["size"] == source["size"] and previous["mtime_ns"] == source["mtime_ns"]:
+            touched, spans = set(), previous.get("days")
+        elif previous.get("days") is not None:
+            appended = _day_spans(_read_range(csv_path, previous["offset"], end), previous["offset"])
+            if appended is not None:
+                touched, spans = set(appended), _merge_spans(previous["days"], appended)
+
+    if touched == set() and all(output_ok(key) for key in manifest):
+        print(f"Dni do narysowania: 0 z {len(manifest)} (plik bez nowych wierszy)")
+        return []
+
+    new_manifest = {}
+    if touched is not None and spans is not None:
+        # tylko dni z nowymi wierszami (albo bez PNG); reszta wpisów manifestu bez zmian
+        needed = touched | {key.split(":", 1)[1] for key in manifest if not output_ok(key)}
+        new_manifest = {key: entry for key, entry in manifest.items() if key.split(":", 1)[1] not in needed}
+        df = _prepare_days(_load_day_rows(csv_path, spans, needed))
+    else:
+        touched = None
+        data = _read_range(csv_path, 0, end)
+        spans = _day_spans(data)
+        df = _prepare_days(load_and_sort_logs(io.BytesIO(data)))
+    main_col = main_col or detect_main_column(df)
+    families = {
+        "heatmap": (df.dropna(subset=[main_col]), _draw_heatmap, (main_col, save_dir),
+                    [main_col, "ts_ms"], {"main_col": main_col}),
+        "time_spent": (_time_spent_rows(df), _draw_time_spent, (top_n, save_dir),
+                       ["domain", "time", "ts_ms"], {"top_n": top_n}),
+    }
+
+    jobs = []
+    for kind, (frame, draw, args, cols, params) in families.items():
+        for day, group in frame.groupby("day"):
+            key = f"{kind}:{day}"
+            if touched is not None and day not in touched and key in manifest and output_ok(key):
+                new_manifest[key] = manifest[key]   # dzień bez nowych wierszy: bez haszowania
+                continue
+            entry = {"fingerprint": _fingerprint(group, cols), **params}
+            new_manifest[key] = entry
+            old = dict(manifest.get(key, {}))
+            old.pop("empty", False)
+            if old == entry and output_ok(key):
+                new_manifest[key] = manifest[key]
+                continue
+            jobs.append((kind, day, draw, group, args))
+
+    print(f"Dni do narysowania: {len(jobs)} z {len(new_manifest)}")
+    results = []
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [(kind, day, pool.submit(draw, day, group, *args)) for kind, day, draw, group, args in jobs]
+            for kind, day, future in futures:
+                try:
+                    output_file = future.result()
+                    if output_file is None:
+                        new_manifest[f"{kind}:{day}"]["empty"] = True
+                    results.append((kind, day, output_file))
+                except Exception as e:
+                    print(f"Błąd rysowania {kind} dla dnia {day}: {e}")
+                    new_manifest.pop(f"{kind}:{day}", None)
+
+    new_manifest[SOURCE_KEY] = dict(source, offset=end, main_col=main_col, days=spans)
+    _save_manifest(save_dir, new_manifest)
+    return results
+
+
 if __name__ == "__main__":
     path_csv = "./data/data_html.csv"
     df = load_and_sort_logs(path_csv)
     main_col = detect_main_column(df)
     transitions = count_transitions(df, main_col)
-    plot_heatmaps_per_day(df, main_col, save_dir="./plots")
-    summary = plot_time_spent_histograms_per_day(path_csv, top_n=10)
+    summary = render_daily_reports(path_csv, main_col, top_n=10, save_dir="./plots")
     print(summary)
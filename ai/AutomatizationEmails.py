@@ -1,3 +1,4 @@
-from ai.Inizialization import df
+from ai.Inizialization import load_data
 
-df1 = df
\ No newline at end of file
+if __name__ == "__main__":
+    df1 = load_data()
@@ -1,18 +1,25 @@
 ## busines email : id, subject, timestamp, body, from, to, direction, domain
+# Wczytywanie przez ai.email_loader: strumieniowo, ze schematem, bez duplikatów id,
+# z cache kolumnowym (kolejne uruchomienia nie parsują CSV ponownie).
+# Uruchamiaj z katalogu głównego: python -m ai.Inizialization
 
-import pandas as pd
+import sys
+from pathlib import Path
 
+if __package__ in (None, ""):
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # ai.*, Collector.*
 
-df1 = pd.read_csv( "../data/emails.csv" )
-df2 = pd.read_csv("../data/emails1.csv")
+from ai.email_loader import load_emails
 
-df = pd.concat([df1, df2], ignore_index=True)
-df['timestamp'] = df['timestamp'].astype(str).str[:20]
-df['timestamp'] = pd.to_datetime(df['timestamp'], errors='coerce')
-print(df.info())
-print(df.head())
-print(df['timestamp'])
-print(df.isnull().sum())
-df = df.dropna()
-print( df.isnull().sum() )
 
+def load_data(columns=None):
+    """Cleaned mailbox (both CSV files); loaded on call, not on import."""
+    return load_emails(columns=columns)
+
+
+if __name__ == "__main__":
+    df = load_data()
+    print(df.info())
+    print(df.head())
+    print(df['timestamp'])
+    print(df.isnull().sum())
@@ -1,33 +1,33 @@
-import pandas as pd
 from datetime import datetime, timedelta
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.cluster import KMeans
 from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
+import sys
+from pathlib import Path
 from transformers import pipeline
 
-generator = pipeline("text2text-generation", model="google/flan-t5-base")
+# Uruchamiaj z katalogu głównego: python -m ai.MailClasterization
+# (przy `python MailClasterization.py` z ai/ dokładamy katalog główny do sys.path)
+if __package__ in (None, ""):
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
+from ai.email_index import EmailIndex, email_texts
+from ai.email_loader import DATA_DIR, DEFAULT_FILES, load_emails
 
-# Funkcja wczytująca i łącząca pliki
-def load_and_merge(file1, file2):
-    headers = ["id", "subject", "timestamp", "body", "from", "to", "direction", "domain"]
+INDEX_FILE = DATA_DIR / "email_index.npz"
 
-    df1 = pd.read_csv(file1, header=None, names=headers, skiprows=1, encoding="utf-8")
-    df2 = pd.read_csv(file2, header=None, names=headers, skiprows=1, encoding="utf-8")
+generator = pipeline("text2text-generation", model="google/flan-t5-base")
 
-    df1 = df1[df1['id'] != "id"]
-    df2 = df2[df2['id'] != "id"]
 
-    merged_df = pd.concat([df1, df2], ignore_index=True)
-    return merged_df
+# Funkcja wczytująca i łącząca pliki (schemat, duplikaty id i cache: ai.email_loader)
+def load_and_merge(file1, file2):
+    return load_emails([file1, file2])
 
 
 # Funkcja wyodrębniająca maile z dzisiaj
 def get_yesterdays_emails(df):
     yesterday = (datetime.today() - timedelta(days=1)).date()
-    df['timestamp'] = pd.to_datetime(df['timestamp'], errors='coerce', infer_datetime_format=True)
-    df = df.dropna(subset=['timestamp'])
     return df[df['timestamp'].dt.date == yesterday], df[df['timestamp'].dt.date < yesterday]
 
 # Funkcja klasteryzacji maili
@@ -54,6 +54,28 @@ def assign_clusters(df_today, vectorizer, kmeans, threshold=0.8):
     return df_today
 
 
+# Indeks podobieństwa: najbliższy wcześniejszy mail (bez skanowania całej skrzynki)
+def load_or_build_index(df_old, path=INDEX_FILE):
+    try:
+        index = EmailIndex.load(path)
+        index.add(df_old['id'], email_texts(df_old))  # dopisuje tylko nowe id
+    except (OSError, ValueError, KeyError):
+        index = EmailIndex.build(df_old['id'], email_texts(df_old))
+    index.save(path)
+    return index
+
+
+def find_similar_emails(df_today, index, threshold=0.8):
+    best = [
+        (index.query(text, k=1, exclude=email_id) or [(None, 0.0)])[0]
+        for email_id, text in zip(df_today['id'], email_texts(df_today))
+    ]
+    df_today['similar_id'] = [email_id for email_id, _ in best]
+    df_today['similar_score'] = [score for _, score in best]
+    df_today['similar_valid'] = df_today['similar_score'] >= threshold
+    return df_today
+
+
 # Funkcja zapytania użytkownika
 def prompt_user_and_generate_response(email_row):
     print(f"\n📩 Nowy email od: {email_row['from']}")
@@ -97,8 +119,7 @@ def generate_ai_response(email_row):
 
 # --- GŁÓWNY SKRYPT ---
 if __name__ == "__main__":
-    file1 = "../data/emails.csv"
-    file2 = "../data/emails1.csv"
+    file1, file2 = DEFAULT_FILES
 
     df = load_and_merge(file1, file2)
     df_today, df_old = get_yesterdays_emails(df)
@@ -108,7 +129,12 @@ if __name__ == "__main__":
     df_old, vectorizer, kmeans = cluster_emails(df_old, n_clusters=5)
     df_today = assign_clusters(df_today, vectorizer, kmeans, threshold=0.8)
 
+    index = load_or_build_index(df_old)
+    df_today = find_similar_emails(df_today, index, threshold=0.8)
+
     for _, row in df_today.iterrows():
+        if row['similar_valid']:
+            print(f"\n🔁 Podobny wcześniejszy mail: {row['similar_id']} (podobieństwo {row['similar_score']:.2f}) - można użyć jego odpowiedzi")
         if row['cluster_valid']:
             print(f"\n📩 Mail pasuje do klastra {row['cluster']} z podobieństwem {row['similarity']:.2f}")
             response = prompt_user_and_generate_response(row)
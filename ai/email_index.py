@@ -0,0 +1,289 @@
+"""
+Nearest-neighbour index over emails (sparse inverted index).
+
+Emails are hashed into TF-IDF vectors (HashingVectorizer, so inserting new
+mail never refits a vocabulary; IDF is frozen at build time and refreshed by
+building the index again). Vectors are L2-normalised, so cosine similarity is a dot
+product. The main block is kept column-major (CSC): every column is the
+posting list of one term, and a query only touches the postings of its own
+terms. New emails go to a small row-major delta block that is scanned
+directly and merged into the main block once it grows past DELTA_MERGE_ROWS.
+
+Near-duplicates are grouped on insert: an email whose best match scores at
+least `dup_threshold` joins that email's group.
+
+    index = EmailIndex.build(df_old["id"], email_texts(df_old))
+    index.save("data/email_index.npz")
+    index.query("invoice for march", k=5)  # -> [(id, score), ...]
+"""
+
+from pathlib import Path
+
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+
+N_FEATURES = 2 ** 20
+DELTA_MERGE_ROWS = 2000
+DUP_THRESHOLD = 0.9
+
+# MinHash/LSH do grupowania duplikatów przy budowie (20 pasm x 5 wierszy:
+# pary o Jaccardzie termów >= 0.8 trafiają do wspólnego kubełka prawie zawsze)
+LSH_BANDS = 20
+LSH_ROWS = 5
+MAX_BUCKET = 200
+EMPTY_SIGNATURE = np.iinfo(np.uint32).max
+
+
+def email_texts(df):
+    """Text used for similarity (subject + body, like the clustering)."""
+    return (df["subject"].fillna("").astype(str) + " " + df["body"].fillna("").astype(str)).tolist()
+
+
+def _vectorizer(n_features=N_FEATURES):
+    return HashingVectorizer(
+        n_features=n_features,
+        stop_words="english",
+        alternate_sign=False,
+        norm=None,
+        dtype=np.float32,
+    )
+
+
+def minhash_signatures(X, chunk: int = 2000, seed: int = 1) -> np.ndarray:
+    """MinHash of the set of hashed terms of every row (n x LSH_BANDS*LSH_ROWS, uint32)."""
+    rng = np.random.default_rng(seed)
+    n_hashes = LSH_BANDS * LSH_ROWS
+    # multiply-shift: (a*x + b) mod 2**64 >> 32, a nieparzyste
+    a = rng.integers(0, 1 << 63, n_hashes, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+    b = rng.integers(0, 1 << 63, n_hashes, dtype=np.uint64)
+    X = sparse.csr_matrix(X)
+    out = np.full((X.shape[0], n_hashes), EMPTY_SIGNATURE, dtype=np.uint32)
+    for lo in range(0, X.shape[0], chunk):
+        block = X[lo:lo + chunk]
+        rows = np.flatnonzero(np.diff(block.indptr))
+        if not len(rows):
+            continue
+        terms = block.indices.astype(np.uint64)
+        hashed = ((terms[:, None] * a + b) >> np.uint64(32)).astype(np.uint32)
+        out[lo + rows] = np.minimum.reduceat(hashed, block.indptr[rows], axis=0)
+    return out
+
+
+class EmailIndex:
+    def __init__(self, n_features: int = N_FEATURES, dup_threshold: float = DUP_THRESHOLD):
+        self.n_features = n_features
+        self.dup_threshold = dup_threshold
+        self.vectorizer = _vectorizer(n_features)
+        self.idf = np.ones(n_features, dtype=np.float32)
+        self.main = sparse.csc_matrix((0, n_features), dtype=np.float32)
+        self.delta = []            # lista wierszy CSR (1 x n_features)
+        self.ids = []
+        self.groups = []           # grupa near-duplikatów dla każdego maila
+        self._pos = {}             # id -> pozycja
+
+    # Identyfikatory maili trzymamy jako str (tak też trafiają do pliku .npz)
+
+    def __len__(self):
+        return len(self.ids)
+
+    # ---------- Budowa ----------
+
+    @classmethod
+    def build(cls, ids, texts, **kwargs) -> "EmailIndex":
+        """Builds an index over a whole mailbox (IDF computed from it)."""
+        index = cls(**kwargs)
+        counts = index.vectorizer.transform(texts)
+        index._fit_idf(counts)
+        index._insert([str(i) for i in ids], index._weigh(counts))
+        return index
+
+    def _fit_idf(self, counts):
+        n_docs = counts.shape[0]
+        df = np.bincount(counts.indices, minlength=self.n_features)
+        self.idf = (np.log((1 + n_docs) / (1 + df)) + 1).astype(np.float32)
+
+    def _weigh(self, counts):
+        """Sublinear TF * IDF, L2-normalised rows."""
+        X = counts.tocsr(copy=True).astype(np.float32)
+        np.log1p(X.data, out=X.data)
+        X.data *= self.idf[X.indices]
+        return normalize(X, copy=False)
+
+    # ---------- Wstawianie ----------
+
+    def add(self, ids, texts) -> list:
+        """Inserts emails (skips ids already present). Returns their duplicate groups."""
+        fresh = [(str(i), t) for i, t in zip(ids, texts) if str(i) not in self._pos]
+        if not fresh:
+            return []
+        new_ids, new_texts = zip(*fresh)
+        X = self._weigh(self.vectorizer.transform(new_texts))
+        return self._insert(list(new_ids), X)
+
+    def _insert(self, ids, X) -> list:
+        X = sparse.csr_matrix(X)
+        groups = []
+        if len(self) == 0 and X.shape[0] > 1:
+            # pierwszy zbiór: grupowanie wsadowe, potem jeden blok CSC
+            groups = self._group_batch(X)
+            self.main = X.tocsc()
+            start = 0
+        else:
+            start = len(self.ids)
+            for row in range(X.shape[0]):
+                vec = X[row]
+                match = self._top(vec, 1)
+                if match and match[0][1] >= self.dup_threshold:
+                    group = self.groups[match[0][0]]
+                else:
+                    group = start + row
+                groups.append(group)
+                self.delta.append(vec)
+                # kolejne wiersze widzą poprzednie z tej samej partii
+                self.ids.append(ids[row])
+                self.groups.append(group)
+                self._pos[ids[row]] = start + row
+            if len(self.delta) >= DELTA_MERGE_ROWS:
+                self.merge()
+            return groups
+
+        for offset, email_id in enumerate(ids):
+            self._pos[email_id] = start + offset
+        self.ids.extend(ids)
+        self.groups.extend(groups)
+        return groups
+
+    def _group_batch(self, X) -> list:
+        """
+        Near-duplicate groups of a whole batch: MinHash/LSH over the hashed
+        terms proposes candidate pairs, exact cosine confirms them.
+        """
+        n = X.shape[0]
+        parent = np.arange(n)
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        signatures = minhash_signatures(X)
+        pairs = set()
+        for band in range(LSH_BANDS):
+            cols = signatures[:, band * LSH_ROWS:(band + 1) * LSH_ROWS]
+            keys = np.ascontiguousarray(cols).view(np.dtype((np.void, cols.dtype.itemsize * LSH_ROWS))).ravel()
+            order = np.argsort(keys, kind="stable")
+            sorted_keys = keys[order]
+            # kubełki z więcej niż jednym mailem (puste maile nie mają sygnatury)
+            starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+            ends = np.r_[starts[1:], n]
+            for lo, hi in zip(starts[ends - starts > 1], ends[ends - starts > 1]):
+                members = order[lo:hi]
+                if signatures[members[0], 0] == EMPTY_SIGNATURE:
+                    continue
+                members = np.sort(members)[:MAX_BUCKET]
+                for i in range(1, len(members)):
+                    pairs.add((int(members[0]), int(members[i])))
+                    pairs.add((int(members[i - 1]), int(members[i])))
+
+        if pairs:
+            left, right = (np.array(side) for side in zip(*sorted(pairs)))
+            sims = np.asarray(X[left].multiply(X[right]).sum(axis=1)).ravel()
+            for a, b in zip(left[sims >= self.dup_threshold], right[sims >= self.dup_threshold]):
+                ra, rb = find(a), find(b)
+                if ra != rb:
+                    parent[max(ra, rb)] = min(ra, rb)
+        return [int(find(i)) for i in range(n)]
+
+    def merge(self):
+        """Moves the delta block into the main CSC block."""
+        if self.delta:
+            self.main = sparse.vstack([self.main] + self.delta, format="csc")
+            self.delta = []
+
+    # ---------- Zapytania ----------
+
+    def _scores(self, vec) -> np.ndarray:
+        """Cosine scores of `vec` (1 x n_features CSR) against every email."""
+        vec = sparse.csr_matrix(vec)
+        terms, weights = vec.indices, vec.data
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        n_main = self.main.shape[0]
+        if n_main and len(terms):
+            # tylko listy postingów termów z zapytania
+            indptr = self.main.indptr
+            starts, ends = indptr[terms], indptr[terms + 1]
+            lengths = ends - starts
+            if lengths.sum():
+                offsets = np.repeat(starts - np.r_[0, np.cumsum(lengths)[:-1]], lengths)
+                positions = np.arange(lengths.sum()) + offsets
+                scores[:n_main] = np.bincount(
+                    self.main.indices[positions],
+                    weights=self.main.data[positions] * np.repeat(weights, lengths),
+                    minlength=n_main,
+                )
+        if self.delta:
+            block = sparse.vstack(self.delta, format="csr")
+            scores[n_main:] = (block @ vec.T).toarray().ravel()
+        return scores
+
+    def _top(self, vec, k: int) -> list:
+        """[(position, score)] of the k best matches."""
+        if not self.ids:
+            return []
+        scores = self._scores(vec)
+        k = min(k, len(scores))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return [(int(i), float(scores[i])) for i in best if scores[i] > 0]
+
+    def vectorize(self, text: str):
+        return self._weigh(self.vectorizer.transform([text]))
+
+    def query(self, text: str, k: int = 5, exclude=None) -> list:
+        """Top-k most similar emails as [(id, score)]; `exclude` skips one id."""
+        exclude = None if exclude is None else str(exclude)
+        hits = self._top(self.vectorize(text), k + (exclude is not None))
+        return [(self.ids[i], s) for i, s in hits if self.ids[i] != exclude][:k]
+
+    def group_of(self, email_id):
+        return self.groups[self._pos[str(email_id)]]
+
+    def duplicate_groups(self, min_size: int = 2) -> dict:
+        """{group: [ids]} for groups with at least `min_size` emails."""
+        members = {}
+        for email_id, group in zip(self.ids, self.groups):
+            members.setdefault(group, []).append(email_id)
+        return {self.ids[g]: ids for g, ids in members.items() if len(ids) >= min_size}
+
+    # ---------- Zapis ----------
+
+    def save(self, path):
+        self.merge()
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp.npz")
+        main = self.main.tocsc()
+        np.savez(
+            tmp,
+            data=main.data, indices=main.indices, indptr=main.indptr, shape=np.array(main.shape),
+            idf=self.idf,
+            ids=np.array([str(i) for i in self.ids]),
+            groups=np.array(self.groups, dtype=np.int64),
+            meta=np.array([self.n_features, self.dup_threshold]),
+        )
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path) -> "EmailIndex":
+        with np.load(path) as f:
+            n_features, dup_threshold = f["meta"]
+            index = cls(n_features=int(n_features), dup_threshold=float(dup_threshold))
+            index.main = sparse.csc_matrix((f["data"], f["indices"], f["indptr"]), shape=tuple(f["shape"]))
+            index.idf = f["idf"]
+            index.ids = f["ids"].tolist()
+            index.groups = f["groups"].tolist()
+        index._pos = {email_id: pos for pos, email_id in enumerate(index.ids)}
+        return index
@@ -0,0 +1,208 @@
+"""
+Streaming, schema-enforced loader for the email CSVs.
+
+Sources (id, subject, timestamp, body, from, to, direction, domain) are read
+in chunks with every column as a string, repeated header rows are dropped,
+timestamps go through the fixed-position parser from Collector.timestamps,
+rows without an id or a valid timestamp are skipped and duplicate ids keep
+their first occurrence.
+
+The cleaned rows are written chunk by chunk to a columnar cache folder keyed
+by the fingerprints (path, size, mtime) of the source files:
+ - text columns: one UTF-8 buffer + int64 offsets per column,
+ - timestamp: int64 epoch ms, direction/domain: int32 codes + categories.
+Later runs read only the requested columns (and row ranges) from the cache,
+and `iter_emails()` walks it in slices for mailboxes larger than RAM.
+
+    df = load_emails()                                  # whole mailbox
+    df = load_emails(columns=["id", "timestamp", "from"])
+    for batch in iter_emails(batch_rows=100_000): ...
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from Collector.timestamps import UTC, parse_timestamps
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+DEFAULT_FILES = (DATA_DIR / "emails.csv", DATA_DIR / "emails1.csv")
+CACHE_DIR = DATA_DIR / "cache"
+CHUNK_ROWS = 50_000
+
+COLUMNS = ["id", "subject", "timestamp", "body", "from", "to", "direction", "domain"]
+TEXT_COLUMNS = ("id", "subject", "body", "from", "to")
+CATEGORY_COLUMNS = ("direction", "domain")
+CACHE_VERSION = 1
+
+
+# ---------- Źródła ----------
+
+def fingerprint(paths) -> str:
+    """Key of the source set: path, size and mtime of every file."""
+    h = hashlib.sha1(f"v{CACHE_VERSION}".encode())
+    for path in paths:
+        st = os.stat(path)
+        h.update(f"{Path(path).resolve()}|{st.st_size}|{st.st_mtime_ns}\n".encode())
+    return h.hexdigest()[:16]
+
+
+def stream_emails(paths=DEFAULT_FILES, chunksize: int = CHUNK_ROWS):
+    """Yields cleaned DataFrame chunks (timestamp as int64 epoch ms, text as str, unique ids)."""
+    seen = set()
+    for path in paths:
+        reader = pd.read_csv(
+            path,
+            header=None,
+            names=COLUMNS,
+            skiprows=1,
+            dtype=str,
+            keep_default_na=False,
+            encoding="utf-8",
+            on_bad_lines="skip",
+            chunksize=chunksize,
+        )
+        for chunk in reader:
+            chunk = chunk[(chunk["id"] != "id") & (chunk["id"] != "")]   # powtórzone nagłówki
+            ts_ms = parse_timestamps(chunk["timestamp"], naive_iso_tz=UTC)   # czas z pliku bez przesunięcia
+            valid = ts_ms.notna().to_numpy()
+            chunk = chunk[valid].assign(timestamp=ts_ms[valid].astype("int64").to_numpy())
+
+            fresh = ~chunk["id"].duplicated().to_numpy() & ~chunk["id"].isin(seen).to_numpy()
+            chunk = chunk[fresh]
+            seen.update(chunk["id"])
+            if len(chunk):
+                yield chunk.reset_index(drop=True)
+
+
+# ---------- Cache kolumnowy ----------
+
+class _CacheWriter:
+    """Appends chunks to per-column files in a temporary folder."""
+
+    def __init__(self, folder: Path):
+        self.folder = folder
+        folder.mkdir(parents=True)
+        self.rows = 0
+        self.text = {col: open(folder / f"{col}.bin", "wb") for col in TEXT_COLUMNS}
+        self.offsets = {col: [np.zeros(1, dtype=np.int64)] for col in TEXT_COLUMNS}
+        self.text_size = {col: 0 for col in TEXT_COLUMNS}
+        self.ts = open(folder / "timestamp.bin", "wb")
+        self.codes = {col: open(folder / f"{col}.codes", "wb") for col in CATEGORY_COLUMNS}
+        self.categories = {col: {} for col in CATEGORY_COLUMNS}
+
+    def write(self, chunk: pd.DataFrame):
+        for col in TEXT_COLUMNS:
+            encoded = [value.encode("utf-8") for value in chunk[col]]
+            lengths = np.fromiter((len(b) for b in encoded), dtype=np.int64, count=len(encoded))
+            self.text[col].write(b"".join(encoded))
+            self.offsets[col].append(self.text_size[col] + np.cumsum(lengths))
+            self.text_size[col] += int(lengths.sum())
+        self.ts.write(chunk["timestamp"].to_numpy(dtype=np.int64).tobytes())
+        for col in CATEGORY_COLUMNS:
+            mapping = self.categories[col]
+            codes = np.fromiter(
+                (mapping.setdefault(value, len(mapping)) for value in chunk[col]),
+                dtype=np.int32, count=len(chunk),
+            )
+            self.codes[col].write(codes.tobytes())
+        self.rows += len(chunk)
+
+    def close(self, meta: dict):
+        for handle in (*self.text.values(), self.ts, *self.codes.values()):
+            handle.close()
+        for col in TEXT_COLUMNS:
+            np.save(self.folder / f"{col}.offsets.npy", np.concatenate(self.offsets[col]))
+        meta = dict(meta, rows=self.rows, categories={col: list(m) for col, m in self.categories.items()})
+        with open(self.folder / "meta.json", "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+
+def build_cache(paths=DEFAULT_FILES, cache_dir=CACHE_DIR, chunksize: int = CHUNK_ROWS) -> Path:
+    """Streams the sources into a fresh cache folder and drops stale ones."""
+    cache_dir = Path(cache_dir)
+    key = fingerprint(paths)
+    folder = cache_dir / f"emails-{key}"
+    tmp = cache_dir / f"emails-{key}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+
+    writer = _CacheWriter(tmp)
+    for chunk in stream_emails(paths, chunksize):
+        writer.write(chunk)
+    writer.close({"version": CACHE_VERSION, "fingerprint": key, "sources": [str(p) for p in paths]})
+
+    shutil.rmtree(folder, ignore_errors=True)
+    os.replace(tmp, folder)
+    for old in cache_dir.glob("emails-*"):
+        if old != folder:
+            shutil.rmtree(old, ignore_errors=True)   # cache dla innych wersji plików
+    return folder
+
+
+def cache_folder(paths=DEFAULT_FILES, cache_dir=CACHE_DIR, chunksize: int = CHUNK_ROWS) -> Path:
+    """Cache folder for the current source files (built on first use)."""
+    folder = Path(cache_dir) / f"emails-{fingerprint(paths)}"
+    if not (folder / "meta.json").exists():
+        folder = build_cache(paths, cache_dir, chunksize)
+    return folder
+
+
+def _read_slice(folder: Path, meta: dict, columns, start: int, stop: int) -> pd.DataFrame:
+    data = {}
+    for col in columns:
+        if col in TEXT_COLUMNS:
+            offsets = np.load(folder / f"{col}.offsets.npy", mmap_mode="r")
+            lo, hi = int(offsets[start]), int(offsets[stop])
+            with open(folder / f"{col}.bin", "rb") as f:
+                f.seek(lo)
+                buf = f.read(hi - lo)
+            bounds = (offsets[start:stop + 1] - lo).tolist()
+            data[col] = [buf[a:b].decode("utf-8") for a, b in zip(bounds, bounds[1:])]
+        elif col == "timestamp":
+            ts = np.fromfile(folder / "timestamp.bin", dtype=np.int64, count=stop - start, offset=start * 8)
+            data[col] = pd.to_datetime(ts, unit="ms")
+            data["ts_ms"] = ts
+        elif col in CATEGORY_COLUMNS:
+            codes = np.fromfile(folder / f"{col}.codes", dtype=np.int32, count=stop - start, offset=start * 4)
+            data[col] = pd.Categorical.from_codes(codes, categories=meta["categories"][col])
+        else:
+            raise KeyError(f"Unknown email column: {col}")
+    return pd.DataFrame(data)
+
+
+def _open(paths, cache_dir, columns, chunksize):
+    folder = cache_folder(paths, cache_dir, chunksize)
+    with open(folder / "meta.json", encoding="utf-8") as f:
+        meta = json.load(f)
+    return folder, meta, list(columns or COLUMNS)
+
+
+# ---------- API ----------
+
+def load_emails(paths=DEFAULT_FILES, columns=None, cache_dir=CACHE_DIR, chunksize: int = CHUNK_ROWS) -> pd.DataFrame:
+    """
+    Cleaned, de-duplicated emails as one DataFrame.
+
+    Args:
+        paths: Source CSV files (earlier files win on duplicate ids)
+        columns: Subset of COLUMNS to load (default: all)
+        cache_dir: Folder of the columnar cache
+
+    Returns:
+        pd.DataFrame: 'timestamp' as datetime64 (UTC) plus 'ts_ms' (int64 epoch ms),
+        'direction'/'domain' as category, other columns as str
+    """
+    folder, meta, columns = _open(paths, cache_dir, columns, chunksize)
+    return _read_slice(folder, meta, columns, 0, meta["rows"])
+
+
+def iter_emails(paths=DEFAULT_FILES, columns=None, batch_rows: int = CHUNK_ROWS, cache_dir=CACHE_DIR):
+    """Yields the cached mailbox in slices of `batch_rows` (bounded memory)."""
+    folder, meta, columns = _open(paths, cache_dir, columns, batch_rows)
+    for start in range(0, meta["rows"], batch_rows):
+        yield _read_slice(folder, meta, columns, start, min(start + batch_rows, meta["rows"]))